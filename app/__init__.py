@@ -2,10 +2,12 @@ import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from flask_migrate import Migrate
 
 # Création des instances globales
 db = SQLAlchemy()
 login_manager = LoginManager()
+migrate = Migrate()
 login_manager.login_view = 'user.login'  # redirection si non connecté
 
 def create_app():
@@ -19,29 +21,50 @@ def create_app():
     # Chargement de la configuration
     app.config.from_object('config.Config')
 
+    # IP du client transmise par les reverse proxies de confiance
+    if app.config.get('PROXY_FIX_X_FOR'):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+    # Uploads multipart écrits directement sur disque par morceaux
+    from app.uploads import UploadRequest
+    app.request_class = UploadRequest
+
     # Crée le dossier d'uploads si manquant
     os.makedirs(app.config.get('UPLOAD_FOLDER', 'static/uploads'), exist_ok=True)
 
     # Initialisation des extensions
     db.init_app(app)
     login_manager.init_app(app)
+    from app.search import include_name
+    migrate.init_app(app, db, include_name=include_name)
+
+    from app.cache import site_cache, user_cache
+    from app import csrf, site_templates
+    from app.passwords import password_hasher
+    from app.ratelimit import login_throttle
+    from app.events import event_bus
+    csrf.init_app(app)
+    site_cache.init_app(app)
+    user_cache.init_app(app)
+    password_hasher.init_app(app)
+    login_throttle.init_app(app)
+    site_templates.init_app(app)
+    event_bus.init_app(app)
 
     with app.app_context():
         # Import des modèles pour éviter les imports circulaires
         from app import models
-        from app.models import User
+        from app import search  # index plein texte créé avec les tables
 
-        # Fonction pour charger l'utilisateur
+        # Fonction pour charger l'utilisateur (identité en cache, sans requête)
         @login_manager.user_loader
         def load_user(user_id):
             try:
-                return db.session.get(User, int(user_id))
+                return user_cache.get(int(user_id))
             except Exception:
                 return None
 
-        # Crée les tables si elles n'existent pas
-        db.create_all()
-
     # Import et enregistrement des blueprints
     from app.routes.user import user_bp
     from app.routes.super_admin import super_admin_bp
@@ -0,0 +1,252 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask import abort
+from flask_login import UserMixin
+
+# -------------------------------
+# Caches applicatifs (en mémoire par processus, ou partagés via Redis)
+# -------------------------------
+
+
+class MemoryCache:
+    """Cache clé -> valeur avec durée de vie, propre au processus"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                # Purge des entrées expirées, sinon de la plus ancienne
+                now = time.monotonic()
+                for k in [k for k, (_, exp) in self._data.items() if exp < now]:
+                    del self._data[k]
+                if len(self._data) >= self.max_entries:
+                    del self._data[next(iter(self._data))]
+            self._data[key] = (value, time.monotonic() + ttl)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """Même interface, partagée entre processus ; valeurs sérialisées en JSON"""
+
+    def __init__(self, url, prefix='form2:'):
+        import redis  # dépendance optionnelle, uniquement si CACHE_BACKEND = 'redis'
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+
+class LRUCache:
+    """Cache borné en nombre d'entrées, les moins récemment utilisées sortent en premier"""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+def make_cache(app):
+    """Backend choisi par CACHE_BACKEND ('memory' par défaut, ou 'redis' + CACHE_REDIS_URL)"""
+    if app.config.get('CACHE_BACKEND') == 'redis':
+        return RedisCache(app.config['CACHE_REDIS_URL'])
+    return MemoryCache()
+
+
+# -------------------------------
+# Résolution slug -> site des pages publiques
+# -------------------------------
+
+class CachedSite:
+    """Copie en lecture seule des colonnes d'un Site (utilisable hors session)"""
+
+    FIELDS = (
+        'id', 'name', 'slug', 'sub_admin_id',
+        'logo_path', 'logo_width', 'logo_height', 'logo_variants', 'template_version',
+    )
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+    @classmethod
+    def from_model(cls, site):
+        return cls(**{field: getattr(site, field) for field in cls.FIELDS})
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class SiteCache:
+    """
+    Cache slug -> CachedSite avec TTL. Les slugs inconnus sont aussi mis en
+    cache (plus brièvement) pour absorber les 404 répétés. Invalidé
+    explicitement par la création, la modification et la suppression de site.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = make_cache(app)
+        self.ttl = app.config.get('SITE_CACHE_TTL', 300)
+        self.missing_ttl = app.config.get('SITE_CACHE_MISSING_TTL', 30)
+
+    @staticmethod
+    def _key(slug):
+        return f'site:slug:{slug}'
+
+    def get(self, slug):
+        from app.models import Site
+        cached = self.backend.get(self._key(slug))
+        if cached is not None:
+            return CachedSite(**cached) if cached else None
+
+        site = Site.query.filter_by(slug=slug).first()
+        if site is None:
+            self.backend.set(self._key(slug), {}, self.missing_ttl)
+            return None
+        snapshot = CachedSite.from_model(site)
+        self.backend.set(self._key(slug), snapshot.to_dict(), self.ttl)
+        return snapshot
+
+    def get_or_404(self, slug):
+        site = self.get(slug)
+        if site is None:
+            abort(404)
+        return site
+
+    def invalidate(self, *slugs):
+        self.backend.delete(*[self._key(slug) for slug in slugs if slug])
+
+
+site_cache = SiteCache()
+
+
+# -------------------------------
+# Identité des utilisateurs connectés (user_loader de Flask-Login)
+# -------------------------------
+
+class CachedUser(UserMixin):
+    """
+    current_user allégé : seulement les champs utilisés pour les droits.
+    `site` est chargé à la demande (une requête, seulement si un template l'affiche).
+    """
+
+    FIELDS = ('id', 'username', 'role', 'site_id')
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(**{field: getattr(user, field) for field in cls.FIELDS})
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @property
+    def site(self):
+        from app import db
+        from app.models import Site
+        return db.session.get(Site, self.site_id) if self.site_id else None
+
+
+class UserCache:
+    """
+    Cache id -> CachedUser avec TTL court (USER_CACHE_TTL), invalidé par la
+    modification et la suppression d'un utilisateur ou de son mot de passe.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = make_cache(app)
+        self.ttl = app.config.get('USER_CACHE_TTL', 60)
+
+    @staticmethod
+    def _key(user_id):
+        return f'user:id:{user_id}'
+
+    def get(self, user_id):
+        from app import db
+        from app.models import User
+        cached = self.backend.get(self._key(user_id))
+        if cached is not None:
+            return CachedUser(**cached)
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = CachedUser.from_model(user)
+        self.backend.set(self._key(user_id), snapshot.to_dict(), self.ttl)
+        return snapshot
+
+    def invalidate(self, *user_ids):
+        self.backend.delete(*[self._key(user_id) for user_id in user_ids])
+
+
+user_cache = UserCache()
@@ -0,0 +1,22 @@
+from flask import current_app, request
+from flask_wtf.csrf import generate_csrf, validate_csrf
+from wtforms.validators import ValidationError
+
+
+def init_app(app):
+    # csrf_token() dans les templates, pour les formulaires écrits à la main
+    app.jinja_env.globals['csrf_token'] = generate_csrf
+
+
+def csrf_valid():
+    """
+    Jeton CSRF des requêtes hors Flask-WTF : en-tête X-CSRFToken ou champ
+    csrf_token. Toujours valide quand WTF_CSRF_ENABLED est désactivé (tests).
+    """
+    if not current_app.config.get('WTF_CSRF_ENABLED', True):
+        return True
+    try:
+        validate_csrf(request.headers.get('X-CSRFToken') or request.form.get('csrf_token'))
+    except ValidationError:
+        return False
+    return True
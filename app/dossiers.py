@@ -0,0 +1,232 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import delete, event, func, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Dossier, DossierTransition, File, UploadSession, DRAFT_STATUS
+from app.storage import blob_relpath, release_blobs
+
+# -------------------------------
+# Statuts des dossiers : machine à états
+# -------------------------------
+# Seules les transitions déclarées ici sont acceptées, pour les rôles
+# indiqués. Chaque changement incrémente Dossier.version (verrouillage
+# optimiste) et ajoute une ligne au journal DossierTransition.
+
+SUBMITTED = 'déposé'
+IN_REVIEW = 'en cours de décision'
+VALIDATED = 'validé'
+DELETED = 'supprimé'  # journal uniquement
+
+STATUS_LABELS = {
+    DRAFT_STATUS: 'Brouillon',
+    SUBMITTED: 'Déposé',
+    IN_REVIEW: 'En cours de décision',
+    VALIDATED: 'Validé',
+}
+
+# (statut de départ, statut d'arrivée) -> rôles autorisés. Le dépôt d'un
+# brouillon n'en fait pas partie : réservé à son auteur (submit_draft)
+TRANSITIONS = {
+    (SUBMITTED, IN_REVIEW): ('sub_admin',),
+    (SUBMITTED, VALIDATED): ('sub_admin',),
+    (IN_REVIEW, VALIDATED): ('sub_admin',),
+    (IN_REVIEW, SUBMITTED): ('sub_admin',),
+    (VALIDATED, IN_REVIEW): ('sub_admin',),
+}
+
+SUB_ADMIN_STATUSES = (SUBMITTED, IN_REVIEW, VALIDATED)
+MAX_BULK_DOSSIERS = 1000
+
+
+def can_transition(source, target, role):
+    return role in TRANSITIONS.get((source, target), ())
+
+
+def next_statuses(source, role):
+    """Statuts accessibles depuis `source` pour `role`, dans l'ordre de déclaration"""
+    return [target for (start, target), roles in TRANSITIONS.items() if start == source and role in roles]
+
+
+def apply_transition(dossier, target, actor, version=None):
+    """
+    Change le statut d'un dossier chargé si la transition est permise au rôle
+    de `actor` et si `version` (celle affichée à l'utilisateur) est toujours
+    la bonne. Renvoie 'updated', 'unchanged', 'invalid_transition' ou
+    'conflict' ; au commit, StaleDataError si le dossier a changé entre-temps.
+    """
+    if dossier.status == target:
+        return 'unchanged'
+    if not can_transition(dossier.status, target, actor.role):
+        return 'invalid_transition'
+    if version is not None and version != dossier.version:
+        return 'conflict'
+    log_transition(db.session, dossier.id, dossier.site_id, actor.id, dossier.status, target)
+    dossier.status = target
+    return 'updated'
+
+
+def submit_draft(dossier, actor):
+    """Dépose un brouillon de `actor` ; False si ce n'est pas l'un de ses brouillons"""
+    if dossier.status != DRAFT_STATUS or dossier.user_id != actor.id:
+        return False
+    log_transition(db.session, dossier.id, dossier.site_id, actor.id, DRAFT_STATUS, SUBMITTED)
+    dossier.status = SUBMITTED
+    return True
+
+
+# -------------------------------
+# Journal des transitions : écrit par lots au commit
+# -------------------------------
+# Les entrées s'accumulent dans la session et partent en un seul INSERT
+# (executemany) juste avant le commit : une opération en masse sur 1000
+# dossiers n'ajoute qu'une requête, et le journal suit la transaction.
+
+def log_transition(session, dossier_id, site_id, actor_id, source, target):
+    session.info.setdefault('pending_transitions', []).append({
+        'dossier_id': dossier_id, 'site_id': site_id, 'actor_id': actor_id,
+        'from_status': source, 'to_status': target, 'created_at': datetime.utcnow(),
+    })
+
+
+@event.listens_for(Session, 'after_flush')
+def _log_new_dossiers(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, Dossier):
+            log_transition(session, obj.id, obj.site_id, obj.user_id, None, obj.status)
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_transitions(session):
+    if session.in_nested_transaction():
+        return
+    session.flush()  # dossiers créés : entrées ajoutées par after_flush
+    pending = session.info.pop('pending_transitions', None)
+    if pending:
+        session.execute(insert(DossierTransition), pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_transitions(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop('pending_transitions', None)
+
+
+def status_timings(site_id):
+    """
+    Durées par statut pour un site, calculées sur le journal seul : nombre de
+    passages terminés, durée moyenne (secondes) et dossiers encore dans le statut.
+    """
+    left_at = func.lead(DossierTransition.created_at, type_=DossierTransition.created_at.type).over(
+        partition_by=DossierTransition.dossier_id, order_by=DossierTransition.id
+    )
+    rows = db.session.execute(
+        select(DossierTransition.to_status, DossierTransition.created_at, left_at.label('left_at'))
+        .where(DossierTransition.site_id == site_id)
+        .execution_options(yield_per=1000)
+    )
+    stats = defaultdict(lambda: {'count': 0, 'open': 0, 'total_seconds': 0.0})
+    for status, entered_at, left in rows:
+        if status == DELETED:
+            continue
+        entry = stats[status]
+        if left is None:
+            entry['open'] += 1
+        else:
+            entry['count'] += 1
+            entry['total_seconds'] += (left - entered_at).total_seconds()
+    return {
+        status: {
+            'count': entry['count'],
+            'open': entry['open'],
+            'avg_seconds': round(entry['total_seconds'] / entry['count'], 1) if entry['count'] else None,
+        }
+        for status, entry in stats.items()
+    }
+
+
+# -------------------------------
+# Traitement en masse par le sous-admin
+# -------------------------------
+# Une opération en masse autorise tous les ids en une requête (dossiers du
+# site, brouillons exclus), puis les modifie en un seul UPDATE / DELETE.
+# Résultat par id : 'updated', 'unchanged', 'invalid_transition',
+# 'conflict', 'deleted' ou 'not_found' (les dossiers d'autres sites sont
+# "introuvables" : leur existence n'est pas révélée).
+
+def _authorized(site_id, ids):
+    """{id: (statut, version)} des dossiers du site parmi `ids`"""
+    return {
+        row.id: row for row in db.session.execute(
+            select(Dossier.id, Dossier.status, Dossier.version).where(
+                Dossier.id.in_(ids), Dossier.site_id == site_id, Dossier.status != DRAFT_STATUS
+            )
+        )
+    }
+
+
+def bulk_update_status(site_id, ids, status, actor, versions=None):
+    """
+    Passe les dossiers `ids` du site au statut `status` (à commiter par
+    l'appelant). `versions` : {id: version vue par le client} ; sinon la
+    version lue ici, ce qui protège encore des modifications concurrentes.
+    """
+    found = _authorized(site_id, ids)
+    versions = versions or {}
+    results, expected = {}, {}
+    for dossier_id in ids:
+        row = found.get(dossier_id)
+        if row is None:
+            results[dossier_id] = 'not_found'
+        elif row.status == status:
+            results[dossier_id] = 'unchanged'
+        elif not can_transition(row.status, status, actor.role):
+            results[dossier_id] = 'invalid_transition'
+        elif versions.get(dossier_id, row.version) != row.version:
+            results[dossier_id] = 'conflict'
+        else:
+            expected[dossier_id] = row.version
+
+    if expected:
+        # Même version = même statut : chaque modification l'incrémente
+        updated = set(db.session.execute(
+            update(Dossier)
+            .where(tuple_(Dossier.id, Dossier.version).in_(list(expected.items())),
+                   Dossier.site_id == site_id)
+            .values(status=status, version=Dossier.version + 1)
+            .returning(Dossier.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        for dossier_id in expected:
+            if dossier_id in updated:
+                results[dossier_id] = 'updated'
+                log_transition(db.session, dossier_id, site_id, actor.id, found[dossier_id].status, status)
+            else:
+                results[dossier_id] = 'conflict'
+    return {dossier_id: results[dossier_id] for dossier_id in ids}
+
+
+def bulk_delete(site_id, ids, actor):
+    """
+    Supprime les dossiers `ids` du site avec leurs fichiers (à commiter par
+    l'appelant). Le DELETE en masse ne passe pas par l'ORM : les références
+    aux blobs sont rendues ici, l'index plein texte suit par ses triggers.
+    """
+    found = _authorized(site_id, ids)
+    if found:
+        targets = list(found)
+        files = db.session.execute(
+            select(File.checksum, File.path).where(File.dossier_id.in_(targets), File.checksum.is_not(None))
+        ).all()
+        released = [checksum for checksum, path in files if path == blob_relpath(checksum)]
+        for model in (File, UploadSession):
+            db.session.execute(delete(model).where(model.dossier_id.in_(targets))
+                               .execution_options(synchronize_session=False))
+        db.session.execute(delete(Dossier).where(Dossier.id.in_(targets), Dossier.site_id == site_id)
+                           .execution_options(synchronize_session=False))
+        if released:
+            release_blobs(db.session, released)
+        for dossier_id, row in found.items():
+            log_transition(db.session, dossier_id, site_id, actor.id, row.status, DELETED)
+    return {dossier_id: 'deleted' if dossier_id in found else 'not_found' for dossier_id in ids}
@@ -0,0 +1,234 @@
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event, delete, func, insert, select
+from sqlalchemy.orm import Session
+from app import db
+from app.models import MailboxCounter, MessageEvent
+
+# -------------------------------
+# Notifications temps réel de la messagerie (Server-Sent Events)
+# -------------------------------
+# Chaque connexion SSE s'abonne aux événements de son utilisateur dans le
+# processus (LocalBroker). Le backend EVENTS_BACKEND relaie les événements
+# publiés par les autres processus :
+#   'memory'   : aucun relais (un seul processus) ;
+#   'database' : table message_event lue par un seul thread par processus ;
+#   'redis'    : pub/sub Redis.
+# Les événements ne partent qu'après le commit de la transaction qui les a
+# produits (hooks de session, comme la libération des blobs).
+
+
+class Subscription:
+    def __init__(self, max_pending=100):
+        self._queue = queue.Queue(maxsize=max_pending)
+
+    def put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            pass  # client trop lent : il resynchronise au prochain événement "unread"
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LocalBroker:
+    """Abonnés du processus : une file par connexion SSE"""
+
+    def __init__(self, app=None):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def subscribe(self, user_id):
+        subscription = Subscription()
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        self._listen()
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                self._subscribers[user_id].discard(subscription)
+                if not self._subscribers[user_id]:
+                    del self._subscribers[user_id]
+
+    def dispatch(self, user_id, name, data):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put((name, data))
+
+    def publish(self, events):
+        for user_id, name, data in events:
+            self.dispatch(user_id, name, data)
+
+    def _listen(self):
+        """Démarre la réception des autres processus (backends partagés)"""
+
+
+class DatabaseBroker(LocalBroker):
+    """Relais par la table message_event : un seul thread par processus la lit"""
+
+    def __init__(self, app):
+        super().__init__()
+        self.origin = uuid.uuid4().hex[:16]
+        self.poll_interval = app.config.get('EVENTS_POLL_INTERVAL', 1.0)
+        self.retention = app.config.get('EVENTS_RETENTION', 60)
+        with app.app_context():
+            self._engine = db.engine
+        self._thread = None
+
+    def publish(self, events):
+        # Abonnés locaux servis tout de suite, les autres processus lisent la table
+        super().publish(events)
+        with self._engine.begin() as connection:
+            connection.execute(insert(MessageEvent), [
+                {'origin': self.origin, 'user_id': user_id, 'name': name, 'data': json.dumps(data)}
+                for user_id, name, data in events
+            ])
+
+    def _listen(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            with self._engine.connect() as connection:
+                last_id = connection.execute(select(func.max(MessageEvent.id))).scalar() or 0
+            self._thread = threading.Thread(target=self._poll, args=(last_id,), daemon=True)
+            self._thread.start()
+
+    def _poll(self, last_id):
+        last_prune = time.monotonic()
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                with self._engine.begin() as connection:
+                    rows = connection.execute(
+                        select(MessageEvent).where(MessageEvent.id > last_id).order_by(MessageEvent.id)
+                    ).all()
+                    if time.monotonic() - last_prune > self.retention:
+                        limit = datetime.utcnow() - timedelta(seconds=self.retention)
+                        connection.execute(delete(MessageEvent).where(MessageEvent.created_at < limit))
+                        last_prune = time.monotonic()
+            except Exception:
+                continue  # base momentanément indisponible : nouvel essai au prochain tour
+            for row in rows:
+                last_id = row.id
+                if row.origin != self.origin:
+                    self.dispatch(row.user_id, row.name, json.loads(row.data))
+
+
+class RedisBroker(LocalBroker):
+    """Relais par pub/sub Redis (canal unique, filtré par utilisateur à la réception)"""
+
+    def __init__(self, app, channel='form2:events'):
+        super().__init__()
+        import redis  # dépendance optionnelle, uniquement si EVENTS_BACKEND = 'redis'
+        self._client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+        self.channel = channel
+        self._thread = None
+
+    def publish(self, events):
+        for user_id, name, data in events:
+            self._client.publish(self.channel, json.dumps([user_id, name, data]))
+
+    def _listen(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._receive, daemon=True)
+            self._thread.start()
+
+    def _receive(self):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for item in pubsub.listen():
+                    user_id, name, data = json.loads(item['data'])
+                    self.dispatch(user_id, name, data)
+            except Exception:
+                time.sleep(1)  # connexion Redis perdue : réabonnement
+
+
+BROKERS = {'memory': LocalBroker, 'database': DatabaseBroker, 'redis': RedisBroker}
+
+
+class EventBus:
+    def __init__(self, app=None):
+        self.broker = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.broker = BROKERS[app.config.get('EVENTS_BACKEND', 'memory')](app)
+
+    def subscribe(self, user_id):
+        return self.broker.subscribe(user_id)
+
+    def publish(self, events):
+        if events:
+            self.broker.publish(events)
+
+
+event_bus = EventBus()
+
+
+# --- Événements en attente du commit ---
+
+def notify_message(message):
+    """Nouveau message pour son destinataire (envoyé après le commit)"""
+    db.session.info.setdefault('pending_events', []).append((message.recipient_id, 'message', {
+        'id': message.id,
+        'conversation_id': message.conversation_id,
+        'subject': message.subject,
+        'sender_id': message.sender_id,
+    }))
+
+
+def notify_unread(user_id):
+    """Compteur de non lus modifié : relu une seule fois après le commit"""
+    db.session.info.setdefault('pending_unread', set()).add(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_after_commit(session):
+    if session.in_nested_transaction():
+        return  # SAVEPOINT relâché : attendre le commit de la transaction englobante
+    events = session.info.pop('pending_events', [])
+    unread = session.info.pop('pending_unread', None)
+    if not events and not unread:
+        return
+    if unread:
+        unread, counts = list(unread), {}
+        with db.engine.connect() as connection:
+            # Par lots : une diffusion peut toucher des milliers d'utilisateurs
+            for start in range(0, len(unread), 500):
+                counts.update(connection.execute(
+                    select(MailboxCounter.user_id, MailboxCounter.unread_count)
+                    .where(MailboxCounter.user_id.in_(unread[start:start + 500]))
+                ).all())
+        events += [(user_id, 'unread', {'count': counts.get(user_id, 0)}) for user_id in unread]
+    event_bus.publish(events)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    if session.in_nested_transaction():
+        return  # retour à un SAVEPOINT : les événements d'avant restent valables
+    session.info.pop('pending_events', None)
+    session.info.pop('pending_unread', None)
+
+
+def format_event(name, data):
+    """Trame SSE"""
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
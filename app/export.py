@@ -0,0 +1,106 @@
+import io
+import os
+import zipfile
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app import db
+from app.models import Dossier, File, DRAFT_STATUS
+
+CHUNK_SIZE = 64 * 1024
+EXPORT_BATCH_SIZE = 500  # lignes (dossier, fichier) lues à la fois
+
+# Formats déjà compressés : stockés tels quels dans le ZIP (pas de CPU perdu)
+STORED_EXTENSIONS = {
+    'pdf', 'jpg', 'jpeg', 'png', 'gif', 'webp', 'heic',
+    'zip', 'gz', 'bz2', 'xz', '7z', 'rar',
+    'docx', 'xlsx', 'pptx', 'odt', 'ods', 'odp',
+    'mp3', 'mp4', 'mov', 'avi', 'mkv',
+}
+
+
+class _ZipSink(io.RawIOBase):
+    """Flux non seekable : zipfile y écrit, le générateur vide le tampon au fur et à mesure"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _compress_type(filename):
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+def stream_zip(entries):
+    """
+    Génère un ZIP à la volée à partir de (nom dans l'archive, chemin disque) :
+    ni fichier temporaire ni archive en mémoire, seulement un morceau à la fois.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+        for arcname, path in entries:
+            if not os.path.isfile(path):
+                continue
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = _compress_type(arcname)
+            with open(path, 'rb') as src, archive.open(info, 'w') as dst:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    dst.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _dossier_folder(dossier_id, last_name, first_name):
+    return secure_filename(f'{dossier_id}_{last_name}_{first_name}') or str(dossier_id)
+
+
+def export_entries(query):
+    """
+    Génère (nom dans l'archive, chemin disque) pour les fichiers de `query`,
+    lus par lots pendant l'envoi : mémoire constante quel que soit le nombre
+    de fichiers. À consommer dans le contexte de la requête (stream_with_context).
+    """
+    rows = query.with_entities(
+        Dossier.id, Dossier.last_name, Dossier.first_name, File.filename, File.path
+    ).order_by(Dossier.id, File.id).yield_per(EXPORT_BATCH_SIZE)
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    current, used = None, set()
+    for dossier_id, last_name, first_name, filename, path in rows:
+        if dossier_id != current:
+            # Un sous-dossier par dossier : les noms n'ont à être uniques qu'à l'intérieur
+            current, used = dossier_id, set()
+        folder = _dossier_folder(dossier_id, last_name, first_name)
+        base, ext = os.path.splitext(secure_filename(filename) or 'fichier')
+        arcname, counter = f'{folder}/{base}{ext}', 1
+        while arcname in used:
+            arcname = f'{folder}/{base}_{counter}{ext}'
+            counter += 1
+        used.add(arcname)
+        yield arcname, os.path.join(upload_folder, path or filename)
+
+
+def dossier_export_entries(dossier):
+    return export_entries(db.session.query(File).join(Dossier).filter(Dossier.id == dossier.id))
+
+
+def site_export_entries(site_id):
+    return export_entries(
+        db.session.query(File).join(Dossier).filter(
+            Dossier.site_id == site_id, Dossier.status != DRAFT_STATUS
+        )
+    )
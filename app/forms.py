@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, SelectField, MultipleFileField
+from wtforms import StringField, PasswordField, SubmitField, SelectField, MultipleFileField, TextAreaField
 from wtforms.validators import DataRequired, Email, Length, EqualTo, Optional
 
 class LoginForm(FlaskForm):
@@ -35,6 +35,7 @@ class SiteForm(FlaskForm):
     name = StringField("Nom du site", validators=[DataRequired(), Length(min=2, max=100)])
     slug = StringField("Slug du site (URL friendly)", validators=[DataRequired(), Length(min=2, max=100)])
     sub_admin_id = SelectField("Sous-admin", coerce=int, choices=[])
+    register_template = TextAreaField("Formulaire d'inscription (template Jinja)", validators=[Optional()])
     submit = SubmitField("Valider")
 
 class UserForm(FlaskForm):
@@ -0,0 +1,397 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, delete, exc, exists, func, insert, literal, or_, select, true, union, update
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.events import notify_message, notify_unread
+from app.models import ArchivedMessage, Broadcast, Conversation, ConversationMember, MailboxCounter, Message, User
+from app.search import index_broadcast, index_message, unindex_messages
+
+# -------------------------------
+# Boîte de réception : fils, état de lecture et compteurs précalculés
+# -------------------------------
+# Envoi, lecture et suppression passent par ces fonctions : les compteurs
+# (MailboxCounter) et les pointeurs de fil (ConversationMember) sont
+# modifiés dans la même transaction que le message. Le badge "non lus"
+# coûte une lecture par clé primaire, la liste des fils une requête.
+
+
+def _update_or_insert(model, keys, values, initial):
+    """UPDATE de la ligne identifiée par `keys`, INSERT de `initial` si elle n'existe pas"""
+    condition = [getattr(model, name) == value for name, value in keys.items()]
+    statement = update(model).where(*condition).values(**values) \
+        .execution_options(synchronize_session=False)
+    if db.session.execute(statement).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(model).values(**keys, **initial))
+    except exc.IntegrityError:
+        # Ligne créée en parallèle par une autre requête
+        db.session.execute(statement)
+
+
+def adjust_counters(user_id, inbox=0, unread=0):
+    """Ajoute `inbox` / `unread` aux compteurs de l'utilisateur (ligne créée au besoin)"""
+    _update_or_insert(
+        MailboxCounter, {'user_id': user_id},
+        {
+            'inbox_count': MailboxCounter.inbox_count + inbox,
+            'unread_count': MailboxCounter.unread_count + unread,
+        },
+        {'inbox_count': max(inbox, 0), 'unread_count': max(unread, 0)}
+    )
+    if unread:
+        notify_unread(user_id)
+
+
+def _touch_member(conversation_id, user_id, message, unread=0):
+    """Fait pointer le fil de l'utilisateur sur `message`"""
+    _update_or_insert(
+        ConversationMember, {'conversation_id': conversation_id, 'user_id': user_id},
+        {
+            'last_message_id': message.id,
+            'last_message_at': message.timestamp,
+            'unread_count': ConversationMember.unread_count + unread,
+        },
+        {
+            'last_message_id': message.id,
+            'last_message_at': message.timestamp,
+            'unread_count': max(unread, 0),
+        }
+    )
+
+
+def _adjust_member_unread(conversation_id, user_id, unread):
+    db.session.execute(
+        update(ConversationMember)
+        .where(ConversationMember.conversation_id == conversation_id,
+               ConversationMember.user_id == user_id)
+        .values(unread_count=ConversationMember.unread_count + unread)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def deliver_message(message, reply_to=None):
+    """
+    Ajoute le message à la session, dans le fil de `reply_to` ou dans une
+    nouvelle conversation, et le compte chez le destinataire (à commiter
+    par l'appelant).
+    """
+    if reply_to is not None:
+        message.conversation_id = reply_to.conversation_id
+        message.reply_to_id = reply_to.id
+    else:
+        conversation = Conversation(subject=message.subject)
+        db.session.add(conversation)
+        message.conversation = conversation
+    if message.timestamp is None:
+        message.timestamp = datetime.utcnow()
+    db.session.add(message)
+    db.session.flush()  # id du message pour les pointeurs de fil
+
+    unread = 1 if message.unread else 0
+    adjust_counters(message.recipient_id, inbox=1, unread=unread)
+    _touch_member(message.conversation_id, message.sender_id, message)
+    _touch_member(message.conversation_id, message.recipient_id, message, unread=unread)
+    index_message(message)
+    notify_message(message)
+
+
+def mark_read(message):
+    """Marque le message comme lu ; UPDATE conditionnel pour ne décompter qu'une fois"""
+    if not message.unread:
+        return False
+    read_at = datetime.utcnow()
+    marked = db.session.execute(
+        update(Message)
+        .where(Message.id == message.id, Message.read_at.is_(None))
+        .values(read_at=read_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    set_committed_value(message, 'read_at', read_at)
+    if marked:
+        adjust_counters(message.recipient_id, unread=-1)
+        if message.conversation_id:
+            _adjust_member_unread(message.conversation_id, message.recipient_id, -1)
+    return bool(marked)
+
+
+def mark_thread_read(conversation_id, user_id):
+    """Marque comme lus tous les messages du fil reçus par l'utilisateur ; renvoie leur nombre"""
+    marked = db.session.execute(
+        update(Message)
+        .where(Message.conversation_id == conversation_id,
+               Message.recipient_id == user_id,
+               Message.read_at.is_(None))
+        .values(read_at=datetime.utcnow())
+        .execution_options(synchronize_session='fetch')
+    ).rowcount
+    if marked:
+        adjust_counters(user_id, unread=-marked)
+        _adjust_member_unread(conversation_id, user_id, -marked)
+    return marked
+
+
+def remove_message(message):
+    """Supprime le message ; les fils qui pointaient dessus reculent au message précédent"""
+    unread = -1 if message.unread else 0
+    adjust_counters(message.recipient_id, inbox=-1, unread=unread)
+    conversation_id = message.conversation_id
+    if conversation_id and unread:
+        _adjust_member_unread(conversation_id, message.recipient_id, unread)
+
+    # Réponses au message : gardées dans le fil, sans message parent
+    db.session.execute(
+        update(Message).where(Message.reply_to_id == message.id).values(reply_to_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    # Pointeurs détachés avant la suppression (clé étrangère vers le message)
+    db.session.execute(
+        update(ConversationMember)
+        .where(ConversationMember.last_message_id == message.id)
+        .values(last_message_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    if message.broadcast_id is None:
+        unindex_messages(message.id)  # diffusion : document partagé par les autres copies
+    db.session.delete(message)
+    db.session.flush()
+    if conversation_id:
+        _refresh_conversation(conversation_id)
+
+
+def _refresh_conversation(conversation_id):
+    """Pointeurs détachés : dernier message que chaque participant peut voir"""
+    detached = db.session.execute(
+        select(ConversationMember.user_id).where(
+            ConversationMember.conversation_id == conversation_id,
+            ConversationMember.last_message_id.is_(None))
+    ).scalars().all()
+    for user_id in detached:
+        last = db.session.execute(
+            select(Message.id, Message.timestamp)
+            .where(Message.conversation_id == conversation_id,
+                   (Message.sender_id == user_id) | (Message.recipient_id == user_id))
+            .order_by(Message.id.desc()).limit(1)
+        ).first()
+        member = (ConversationMember.conversation_id == conversation_id) & \
+            (ConversationMember.user_id == user_id)
+        if last is None:
+            if _has_archived(conversation_id, user_id):
+                continue  # fil gardé (pointeur vide) : ses messages sont lisibles dans l'archive
+            db.session.execute(delete(ConversationMember).where(member)
+                               .execution_options(synchronize_session=False))
+        else:
+            db.session.execute(
+                update(ConversationMember).where(member)
+                .values(last_message_id=last.id, last_message_at=last.timestamp)
+                .execution_options(synchronize_session=False)
+            )
+
+    if not db.session.execute(
+        select(Message.id).where(Message.conversation_id == conversation_id).limit(1)
+    ).first() and not _has_archived(conversation_id):
+        # Plus aucun message : le fil disparaît
+        db.session.execute(delete(ConversationMember).where(
+            ConversationMember.conversation_id == conversation_id))
+        db.session.execute(delete(Conversation).where(Conversation.id == conversation_id))
+
+
+def _has_archived(conversation_id, user_id=None):
+    condition = ArchivedMessage.conversation_id == conversation_id
+    if user_id is not None:
+        condition &= (ArchivedMessage.sender_id == user_id) | (ArchivedMessage.recipient_id == user_id)
+    return db.session.execute(select(ArchivedMessage.id).where(condition).limit(1)).first() is not None
+
+
+def broadcast_message(sender_id, subject, body, recipients, target):
+    """
+    Diffuse un message aux utilisateurs de `recipients` (select d'id) : le
+    corps est stocké une fois (Broadcast), puis les lignes Message, les
+    participations au fil et les compteurs sont écrits en quelques
+    INSERT ... SELECT / UPDATE, quel que soit le nombre de destinataires.
+    Chaque destinataire ne voit que sa copie et ses échanges avec l'expéditeur.
+    """
+    now = datetime.utcnow()
+    broadcast = Broadcast(sender_id=sender_id, subject=subject, body=body, target=target)
+    conversation = Conversation(subject=subject, created_at=now)
+    db.session.add_all([broadcast, conversation])
+    db.session.flush()
+
+    recipient_ids = recipients.subquery()
+    message = Message.__table__
+    count = db.session.execute(message.insert().from_select(
+        ['sender_id', 'recipient_id', 'subject', 'timestamp', 'conversation_id', 'broadcast_id'],
+        select(
+            literal(sender_id), recipient_ids.c.id, literal(subject), literal(now, DateTime),
+            literal(conversation.id), literal(broadcast.id)
+        ).where(recipient_ids.c.id != sender_id)
+    )).rowcount
+    broadcast.recipient_count = count
+    if not count:
+        return broadcast
+    index_broadcast(broadcast)
+
+    copies = Message.broadcast_id == broadcast.id
+    # Compteurs : +1 reçu et non lu (lignes existantes, puis lignes manquantes)
+    db.session.execute(
+        update(MailboxCounter)
+        .where(MailboxCounter.user_id.in_(select(Message.recipient_id).where(copies)))
+        .values(inbox_count=MailboxCounter.inbox_count + 1,
+                unread_count=MailboxCounter.unread_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(MailboxCounter.__table__.insert().from_select(
+        ['user_id', 'inbox_count', 'unread_count'],
+        select(Message.recipient_id, literal(1), literal(1)).where(
+            copies, ~exists().where(MailboxCounter.user_id == Message.recipient_id))
+    ))
+    # Fil : chaque destinataire pointe sur sa copie, l'expéditeur sur la dernière
+    db.session.execute(ConversationMember.__table__.insert().from_select(
+        ['conversation_id', 'user_id', 'last_message_id', 'last_message_at', 'unread_count'],
+        select(Message.conversation_id, Message.recipient_id, Message.id, Message.timestamp,
+               literal(1)).where(copies)
+    ))
+    db.session.execute(insert(ConversationMember).values(
+        conversation_id=conversation.id, user_id=sender_id, unread_count=0,
+        last_message_id=select(func.max(Message.id)).where(copies).scalar_subquery(),
+        last_message_at=now,
+    ))
+
+    for user_id in db.session.execute(select(Message.recipient_id).where(copies)).scalars():
+        notify_unread(user_id)
+    return broadcast
+
+
+def mailbox_counts(user_id):
+    """(messages reçus, non lus)"""
+    row = db.session.execute(
+        select(MailboxCounter.inbox_count, MailboxCounter.unread_count)
+        .where(MailboxCounter.user_id == user_id)
+    ).first()
+    return (row.inbox_count, row.unread_count) if row else (0, 0)
+
+
+# -------------------------------
+# Rétention : archivage des anciens messages
+# -------------------------------
+# Les messages lus plus anciens que la rétention du rôle de leur destinataire
+# quittent la table `message` pour `message_archive` (corps compressé) : la
+# table chaude et ses index ne grossissent plus avec l'historique. Les
+# messages non lus restent dans la boîte. Un message archivé garde son id et
+# reste lisible par find_message.
+
+ARCHIVE_COLUMNS = (
+    'id', 'sender_id', 'recipient_id', 'subject', 'timestamp', 'read_at',
+    'conversation_id', 'reply_to_id', 'broadcast_id',
+)
+
+
+def archive_messages(retention, batch_size=500, now=None):
+    """
+    Archive un lot d'au plus `batch_size` messages expirés (`retention` :
+    rôle -> jours, None pour ne jamais archiver). Renvoie le nombre de
+    messages archivés, 0 quand il n'y a plus rien à faire ; chaque lot est
+    à commiter par l'appelant.
+    """
+    now = now or datetime.utcnow()
+    expired = [
+        (User.role == role) & (Message.timestamp < now - timedelta(days=days))
+        for role, days in retention.items() if days is not None
+    ]
+    if not expired:
+        return 0
+    rows = db.session.execute(
+        select(*[getattr(Message, name) for name in ARCHIVE_COLUMNS], Message._body.label('body'))
+        .join(User, User.id == Message.recipient_id)
+        .where(
+            Message.read_at.is_not(None), or_(*expired),
+        )
+        .order_by(Message.id).limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    ids = [row.id for row in rows]
+    db.session.execute(insert(ArchivedMessage), [
+        {**{name: getattr(row, name) for name in ARCHIVE_COLUMNS},
+         'compressed_body': ArchivedMessage.compress(row.body), 'archived_at': now}
+        for row in rows
+    ])
+
+    # Mêmes détachements qu'une suppression (clés étrangères vers les messages archivés)
+    detached = db.session.execute(
+        select(ConversationMember.conversation_id)
+        .where(ConversationMember.last_message_id.in_(ids)).distinct()
+    ).scalars().all()
+    db.session.execute(
+        update(Message).where(Message.reply_to_id.in_(ids)).values(reply_to_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(ConversationMember).where(ConversationMember.last_message_id.in_(ids))
+        .values(last_message_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(delete(Message).where(Message.id.in_(ids))
+                       .execution_options(synchronize_session=False))
+    # Index plein texte inchangé : le message archivé garde son id et son contenu
+
+    for user_id, count in Counter(row.recipient_id for row in rows).items():
+        adjust_counters(user_id, inbox=-count)
+    for conversation_id in detached:
+        _refresh_conversation(conversation_id)
+    return len(rows)
+
+
+def find_message(message_id):
+    """Message de la boîte, sinon de l'archive (même id), sinon None"""
+    return db.session.get(Message, message_id) or db.session.get(ArchivedMessage, message_id)
+
+
+# -------------------------------
+# Destinataires : visibilité et recherche par préfixe
+# -------------------------------
+
+def visible_recipients(user):
+    """
+    Condition sur User : destinataires qu'un utilisateur peut contacter.
+    Super admin : tout le monde ; sous-admin : son site et les super admins ;
+    utilisateur : les sous-admins de son site et les super admins.
+    """
+    if user.role == 'super_admin':
+        return true()
+    staff = User.role == 'super_admin'
+    if user.site_id is None:
+        return staff
+    if user.role == 'sub_admin':
+        return staff | (User.site_id == user.site_id)
+    return staff | ((User.role == 'sub_admin') & (User.site_id == user.site_id))
+
+
+def search_recipients(user, query, role=None, limit=10):
+    """
+    Destinataires visibles dont le nom d'utilisateur ou l'email commence par
+    `query` : deux parcours d'index (lower(username), lower(email)) bornés
+    par `limit`, réunis dans une seule requête.
+    """
+    prefix = (query or '').strip().lower()
+    if not prefix:
+        return []
+    upper = prefix + '\uffff'
+    conditions = [User.id != user.id, visible_recipients(user)]
+    if role:
+        conditions.append(User.role == role)
+
+    candidates = union(*[
+        select(User.id).where(func.lower(column) >= prefix, func.lower(column) < upper, *conditions)
+        .order_by(func.lower(column)).limit(limit).subquery().select()
+        for column in (User.username, User.email)
+    ]).subquery()
+    return db.session.execute(
+        select(User.id, User.username, User.role)
+        .where(User.id.in_(select(candidates.c.id)))
+        .order_by(func.lower(User.username)).limit(limit)
+    ).all()
+
@@ -1,15 +1,24 @@
+import zlib
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from app.passwords import password_hasher
 from datetime import datetime
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
-    role = db.Column(db.String(20), default='user')  # user / sub_admin / super_admin
-    site_id = db.Column(db.Integer, db.ForeignKey('site.id'), nullable=True)
+    password_hash = db.Column(db.String(255))
+    role = db.Column(db.String(20), default='user', index=True)  # user / sub_admin / super_admin
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id'), nullable=True, index=True)
+
+    # Connexion par site : filter_by(email=..., site_id=...)
+    # Recherche de destinataires par préfixe, insensible à la casse
+    __table_args__ = (
+        db.Index('ix_user_email_site_id', 'email', 'site_id'),
+        db.Index('ix_user_username_lower', db.func.lower(username)),
+        db.Index('ix_user_email_lower', db.func.lower(email)),
+    )
 
     # Relations
     site = db.relationship(
@@ -29,19 +38,37 @@ class User(UserMixin, db.Model):
     # Messagerie
     sent_messages = db.relationship('Message', backref='sender', foreign_keys='Message.sender_id', lazy='dynamic')
     received_messages = db.relationship('Message', backref='recipient', foreign_keys='Message.recipient_id', lazy='dynamic')
+    mailbox_counter = db.relationship('MailboxCounter', uselist=False, cascade='all, delete-orphan')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        valid = password_hasher.verify(self.password_hash, password)
+        if valid and password_hasher.needs_rehash(self.password_hash):
+            # Politique de coût modifiée : nouveau hash, commité avec la connexion
+            self.set_password(password)
+        return valid
 
 
 class Site(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     slug = db.Column(db.String(50), unique=True, nullable=False)  # partie du lien
-    sub_admin_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    sub_admin_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+
+    # Logo : métadonnées enregistrées à l'upload (aucun accès disque à l'affichage)
+    logo_path = db.Column(db.String(255))  # relatif à static/, nom contenant le hash
+    logo_hash = db.Column(db.String(64))
+    logo_size = db.Column(db.Integer)
+    logo_width = db.Column(db.Integer)
+    logo_height = db.Column(db.Integer)
+    logo_mime = db.Column(db.String(50))
+    logo_variants = db.Column(db.String(50))  # largeurs générées, ex. "128,256,512"
+
+    # Formulaire d'inscription propre au site (source Jinja), versionné pour le cache
+    register_template = db.Column(db.Text)  # None : fichier sites/<slug>/register.html ou formulaire par défaut
+    template_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     # Relations
     users = db.relationship(
@@ -57,22 +84,81 @@ class Site(db.Model):
     dossiers = db.relationship('Dossier', backref='site', lazy=True)
 
 
+# Dossier en cours de constitution (uploads reprenables), invisible des sous-admins
+DRAFT_STATUS = 'brouillon'
+
+
 class Dossier(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     email = db.Column(db.String(120), nullable=False)
     job_type = db.Column(db.String(100))
-    status = db.Column(db.String(50), default='déposé')  # déposé / en cours / validé
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    site_id = db.Column(db.Integer, db.ForeignKey('site.id'))
-    files = db.relationship('File', backref='dossier', lazy=True)
+    status = db.Column(db.String(50), default='déposé', index=True)  # machine à états : app.dossiers
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # verrouillage optimiste, +1 à chaque modification
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id'))  # index : ix_dossier_site_id_status
+    files = db.relationship('File', backref='dossier', lazy=True, cascade='all, delete-orphan')
+    upload_sessions = db.relationship('UploadSession', backref='dossier', lazy=True, cascade='all, delete-orphan')
+
+    # Dashboard sous-admin : dossiers d'un site filtrés par statut
+    __table_args__ = (
+        db.Index('ix_dossier_site_id_status', 'site_id', 'status'),
+    )
+    # UPDATE / DELETE via l'ORM : "WHERE version = ..." (StaleDataError si modifié entre-temps)
+    __mapper_args__ = {'version_id_col': version}
+
+
+class DossierTransition(db.Model):
+    """
+    Journal des changements de statut, en ajout seul : audit des décisions et
+    durées par statut sans parcourir `dossier`. Conservé après la suppression
+    du dossier (pas de clé étrangère) ; from_status None : création.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    dossier_id = db.Column(db.Integer, nullable=False)
+    site_id = db.Column(db.Integer)
+    actor_id = db.Column(db.Integer)  # None : reprise de l'existant
+    from_status = db.Column(db.String(50))
+    to_status = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_dossier_transition_dossier_id_id', dossier_id, id),
+        db.Index('ix_dossier_transition_site_id_created_at', site_id, created_at),
+    )
 
 
 class File(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(200), nullable=False)
-    dossier_id = db.Column(db.Integer, db.ForeignKey('dossier.id'))
+    path = db.Column(db.String(500))  # relatif à UPLOAD_FOLDER
+    size = db.Column(db.Integer)
+    checksum = db.Column(db.String(64), index=True)  # SHA-256 = clé du Blob
+    mime_type = db.Column(db.String(100))
+    dossier_id = db.Column(db.Integer, db.ForeignKey('dossier.id'), index=True)
+
+
+class UploadSession(db.Model):
+    """Upload reprenable en cours, rattaché à un dossier brouillon"""
+    id = db.Column(db.String(32), primary_key=True)  # jeton aléatoire
+    dossier_id = db.Column(db.Integer, db.ForeignKey('dossier.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    filename = db.Column(db.String(200), nullable=False)
+    mime_type = db.Column(db.String(100))
+    size = db.Column(db.Integer, nullable=False)  # taille annoncée
+    received = db.Column(db.Integer, nullable=False, default=0)  # octets déjà reçus
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class Blob(db.Model):
+    """Contenu stocké une seule fois, partagé par tous les File de même SHA-256"""
+    checksum = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    mime_type = db.Column(db.String(100))
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
 # -------------------------------
@@ -80,8 +166,147 @@ class File(db.Model):
 # -------------------------------
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     subject = db.Column(db.String(255), nullable=False)
-    body = db.Column(db.Text, nullable=False)
+    _body = db.Column('body', db.Text)  # None : corps partagé de la diffusion
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    read_at = db.Column(db.DateTime)  # None : non lu par le destinataire
+
+    # Fil de discussion : conversation du message et message auquel il répond
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'))
+    reply_to_id = db.Column(db.Integer, db.ForeignKey('message.id'))
+    broadcast_id = db.Column(db.Integer, db.ForeignKey('broadcast.id'), index=True)
+
+    conversation = db.relationship('Conversation', back_populates='messages')
+    broadcast = db.relationship('Broadcast')
+
+    # Boîte de réception : messages d'un destinataire du plus récent au plus ancien
+    # Fil : messages d'une conversation par id décroissant
+    # AUTOINCREMENT : SQLite ne réattribue jamais un id, même supprimé ou
+    # archivé (message_archive garde les ids d'origine)
+    __table_args__ = (
+        db.Index('ix_message_recipient_id_timestamp', recipient_id, timestamp.desc(), id.desc()),
+        db.Index('ix_message_conversation_id_id', conversation_id, id.desc()),
+        {'sqlite_autoincrement': True},
+    )
+
+    archived = False
+
+    @property
+    def unread(self):
+        return self.read_at is None
+
+    @property
+    def body(self):
+        if self._body is None and self.broadcast_id is not None:
+            return self.broadcast.body
+        return self._body
+
+    @body.setter
+    def body(self, value):
+        self._body = value
+
+
+class ArchivedMessage(db.Model):
+    """
+    Message sorti de la table `message` par la rétention (même id) : corps
+    compressé, lu à la demande. Les diffusions gardent le corps partagé.
+    """
+    __tablename__ = 'message_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    compressed_body = db.Column(db.LargeBinary)  # zlib ; None : corps de la diffusion
+    timestamp = db.Column(db.DateTime)
+    read_at = db.Column(db.DateTime)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'))
+    reply_to_id = db.Column(db.Integer)  # message d'origine, archivé ou non
+    broadcast_id = db.Column(db.Integer, db.ForeignKey('broadcast.id'))
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    sender = db.relationship('User', foreign_keys=[sender_id])
+    recipient = db.relationship('User', foreign_keys=[recipient_id])
+    broadcast = db.relationship('Broadcast')
+
+    __table_args__ = (
+        db.Index('ix_message_archive_recipient_id_timestamp', recipient_id, timestamp.desc()),
+        db.Index('ix_message_archive_conversation_id_id', conversation_id, id.desc()),
+    )
+
+    archived = True
+
+    @property
+    def unread(self):
+        return self.read_at is None
+
+    @property
+    def body(self):
+        if self.compressed_body is None:
+            return self.broadcast.body if self.broadcast_id is not None else None
+        return zlib.decompress(self.compressed_body).decode('utf-8')
+
+    @staticmethod
+    def compress(body):
+        return zlib.compress(body.encode('utf-8'), 9) if body is not None else None
+
+
+class Broadcast(db.Model):
+    """Message diffusé à un site ou à un rôle : corps stocké une fois, une ligne Message par destinataire"""
+    id = db.Column(db.Integer, primary_key=True)
+    sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    target = db.Column(db.String(50), nullable=False)  # ex. "site:3", "role:sub_admin"
+    recipient_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Conversation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    messages = db.relationship('Message', back_populates='conversation', lazy='dynamic')
+    members = db.relationship('ConversationMember', back_populates='conversation',
+                              cascade='all, delete-orphan')
+
+
+class ConversationMember(db.Model):
+    """
+    Participation d'un utilisateur à une conversation, avec un pointeur
+    dénormalisé vers le dernier message : la liste des fils est une seule
+    requête sur cette table, sans agrégat sur les messages.
+    """
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    last_message_id = db.Column(db.Integer, db.ForeignKey('message.id'))
+    last_message_at = db.Column(db.DateTime, nullable=False)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+
+    conversation = db.relationship('Conversation', back_populates='members')
+    last_message = db.relationship('Message', foreign_keys=[last_message_id])
+
+    # Fils d'un utilisateur du plus récent au plus ancien
+    __table_args__ = (
+        db.Index('ix_conversation_member_user_id_last_message_at',
+                 user_id, last_message_at.desc(), conversation_id.desc()),
+    )
+
+
+class MessageEvent(db.Model):
+    """Événement de messagerie relayé entre processus (EVENTS_BACKEND = 'database'), purgé après quelques secondes"""
+    id = db.Column(db.Integer, primary_key=True)
+    origin = db.Column(db.String(16), nullable=False)  # processus émetteur (déjà servi localement)
+    user_id = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(20), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class MailboxCounter(db.Model):
+    """Compteurs de la boîte de réception, tenus à jour dans la transaction de chaque envoi / lecture / suppression"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    inbox_count = db.Column(db.Integer, nullable=False, default=0)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
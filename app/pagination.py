@@ -0,0 +1,126 @@
+import base64
+import json
+from datetime import datetime
+from flask import current_app, request, url_for
+from sqlalchemy import and_, or_
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def encode_cursor(values):
+    """Encode les valeurs de tri d'une ligne en curseur opaque (URL safe)"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Décode un curseur ; renvoie None si le curseur est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        return None
+    values = []
+    for column, value in zip(columns, payload):
+        try:
+            is_datetime = column.type.python_type is datetime
+        except NotImplementedError:
+            # Expression sans type Python (ex. score calculé par SQL)
+            is_datetime = False
+        if is_datetime:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                return None
+        values.append(value)
+    return values
+
+
+def _seek_condition(columns, values, forward):
+    """(a, b) > (x, y) écrit sous forme développée pour rester portable"""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        compare = column > values[i] if forward else column < values[i]
+        clauses.append(and_(*equal, compare))
+    return or_(*clauses)
+
+
+class KeysetPage:
+    """Page de résultats paginée par curseur (keyset)"""
+
+    def __init__(self, items, columns, per_page, param, has_next, has_prev):
+        self.items = items
+        self.per_page = per_page
+        self.param = param
+        self.has_next = has_next
+        self.has_prev = has_prev
+        # Curseurs calculés tout de suite : `items` peut ensuite être remplacé
+        # (ex. identifiants remplacés par les objets chargés)
+        self.next_cursor = self._cursor(items[-1], columns) if has_next and items else None
+        self.prev_cursor = self._cursor(items[0], columns) if has_prev and items else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @staticmethod
+    def _cursor(item, columns):
+        return encode_cursor([getattr(item, c.key) for c in columns])
+
+    def _url(self, key, cursor):
+        args = request.args.to_dict()
+        args.pop(f'{self.param}after', None)
+        args.pop(f'{self.param}before', None)
+        args[f'{self.param}{key}'] = cursor
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    @property
+    def next_url(self):
+        return self._url('after', self.next_cursor) if self.next_cursor else None
+
+    @property
+    def prev_url(self):
+        return self._url('before', self.prev_cursor) if self.prev_cursor else None
+
+
+def keyset_paginate(query, order_by, param='', per_page=None, descending=False):
+    """
+    Pagine `query` par curseur sur les colonnes `order_by` (la dernière doit
+    être unique, en général la clé primaire). Les curseurs sont lus dans
+    `request.args` sous `<param>after` / `<param>before`, ce qui permet
+    plusieurs listes paginées indépendamment sur la même page.
+    """
+    max_per_page = current_app.config.get('PAGINATION_MAX_PER_PAGE', MAX_PER_PAGE)
+    if per_page is None:
+        per_page = request.args.get(f'{param}per_page', type=int) or \
+            current_app.config.get('PAGINATION_PER_PAGE', DEFAULT_PER_PAGE)
+    per_page = max(1, min(per_page, max_per_page))
+
+    after = decode_cursor(request.args.get(f'{param}after', ''), order_by) \
+        if request.args.get(f'{param}after') else None
+    before = decode_cursor(request.args.get(f'{param}before', ''), order_by) \
+        if request.args.get(f'{param}before') else None
+
+    # "après" suit l'ordre d'affichage, "avant" le parcourt à l'envers
+    backwards = before is not None and after is None
+    forward = descending == backwards
+    cursor = before if backwards else after
+    if cursor is not None:
+        query = query.filter(_seek_condition(order_by, cursor, forward))
+    ordering = [c.asc() if forward else c.desc() for c in order_by]
+
+    rows = query.order_by(None).order_by(*ordering).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if backwards:
+        rows.reverse()
+        return KeysetPage(rows, order_by, per_page, param, has_next=True, has_prev=has_more)
+    return KeysetPage(rows, order_by, per_page, param, has_next=has_more, has_prev=cursor is not None)
@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# -------------------------------
+# Hachage des mots de passe hors des workers de requêtes
+# -------------------------------
+# Le hachage (scrypt / pbkdf2) est volontairement coûteux en CPU. Avec
+# PASSWORD_HASH_WORKERS > 0, il est exécuté dans un pool de processus : le
+# nombre de hachages simultanés est borné par la taille du pool et les
+# threads des workers (GIL) restent disponibles pour les autres requêtes.
+
+
+class PasswordHasher:
+    """
+    Hache et vérifie les mots de passe selon PASSWORD_HASH_METHOD (format
+    Werkzeug : 'scrypt:32768:8:1', 'pbkdf2:sha256:600000'...). Un hash calculé
+    avec d'autres paramètres est signalé par `needs_rehash`.
+    """
+
+    def __init__(self, app=None):
+        self.method = 'scrypt'
+        self.workers = 0
+        self.timeout = None
+        self._executor = None
+        self._pid = None
+        self._prefix = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.shutdown()
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 30)
+        self._prefix = None
+
+    def _get_executor(self):
+        # Pool créé à la première utilisation et recréé dans un processus
+        # forké (gunicorn --preload) ; 'spawn' évite de forker un worker threadé
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        return self._get_executor().submit(func, *args).result(timeout=self.timeout)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    @property
+    def policy_prefix(self):
+        """Méthode et paramètres effectifs de la politique, ex. 'scrypt:32768:8:1'"""
+        if self._prefix is None:
+            # 'scrypt' ou 'pbkdf2' seuls : Werkzeug complète avec ses valeurs par défaut
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, pwhash):
+        return bool(pwhash) and pwhash.split('$', 1)[0] != self.policy_prefix
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,153 @@
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# -------------------------------
+# Limitation des tentatives de connexion (fenêtre glissante)
+# -------------------------------
+# Chaque tentative est comptée par IP et par email AVANT la vérification du
+# mot de passe : une rafale de credential stuffing est rejetée sans calculer
+# un seul hash. Les tentatives rejetées ne sont pas enregistrées : une rafale
+# ne prolonge pas le blocage, qui se lève quand la plus ancienne tentative
+# retenue sort de la fenêtre (Retry-After).
+
+
+class MemoryWindowStore:
+    """Horodatages des tentatives par clé, propres au processus"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._hits = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window):
+        """
+        Compte une tentative ; renvoie (tentatives dans la fenêtre, plus ancienne).
+        Au-delà de `limit`, la tentative rejetée n'est pas enregistrée.
+        """
+        now = time.time()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+                while len(self._hits) > self.max_keys:
+                    self._hits.popitem(last=False)
+            self._hits.move_to_end(key)
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) >= limit:
+                return len(hits) + 1, hits[0]
+            hits.append(now)
+            return len(hits), hits[0]
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+class RedisWindowStore:
+    """Même interface, partagée entre processus (un ZSET par clé)"""
+
+    # Purge, comptage et ajout atomiques : deux workers ne peuvent pas
+    # enregistrer ensemble la tentative qui dépasse la limite. Le score est
+    # renvoyé en chaîne (Redis tronque les nombres Lua en entiers).
+    HIT_SCRIPT = """
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, ARGV[1] - ARGV[2])
+    local count = redis.call('ZCARD', KEYS[1])
+    if count < tonumber(ARGV[3]) then
+        redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+        redis.call('EXPIRE', KEYS[1], math.ceil(ARGV[2]))
+    end
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return {count + 1, oldest[2] or ARGV[1]}
+    """
+
+    def __init__(self, url, prefix='form2:ratelimit:'):
+        import redis  # dépendance optionnelle, uniquement si CACHE_BACKEND = 'redis'
+        self._client = redis.Redis.from_url(url)
+        self._hit = self._client.register_script(self.HIT_SCRIPT)
+        self.prefix = prefix
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        member = f'{now}:{uuid.uuid4().hex[:8]}'
+        count, oldest = self._hit(keys=[self.prefix + key], args=[repr(now), window, limit, member])
+        return int(count), float(oldest)
+
+    def reset(self, key):
+        self._client.delete(self.prefix + key)
+
+
+def make_window_store(app):
+    if app.config.get('CACHE_BACKEND') == 'redis':
+        return RedisWindowStore(app.config['CACHE_REDIS_URL'])
+    return MemoryWindowStore()
+
+
+class LoginThrottle:
+    """
+    Limites LOGIN_RATE_LIMIT_IP et LOGIN_RATE_LIMIT_EMAIL : (tentatives,
+    fenêtre en secondes). Une connexion réussie remet le compteur de l'email
+    à zéro. Les compteurs de `stats()` sont propres au processus.
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        self.limits = {}
+        self._stats = {'attempts': 0, 'throttled_ip': 0, 'throttled_email': 0}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.store = make_window_store(app)
+        self.enabled = app.config.get('LOGIN_RATE_LIMIT_ENABLED', True)
+        self.limits = {
+            'ip': app.config.get('LOGIN_RATE_LIMIT_IP', (30, 60)),
+            'email': app.config.get('LOGIN_RATE_LIMIT_EMAIL', (10, 900)),
+        }
+
+    @staticmethod
+    def _key(kind, value):
+        return f'login:{kind}:{value}'
+
+    @staticmethod
+    def _normalize_email(email):
+        return (email or '').strip().lower()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def hit(self, ip, email):
+        """
+        Compte une tentative ; renvoie None si elle peut être vérifiée, sinon
+        le nombre de secondes avant la prochaine tentative autorisée.
+        """
+        if not self.enabled:
+            return None
+        self._count('attempts')
+        retry_after = None
+        for kind, value in (('ip', ip), ('email', self._normalize_email(email))):
+            if not value:
+                continue
+            max_attempts, window = self.limits[kind]
+            count, oldest = self.store.hit(self._key(kind, value), max_attempts, window)
+            if count > max_attempts:
+                self._count(f'throttled_{kind}')
+                wait = max(1, math.ceil(oldest + window - time.time()))
+                retry_after = max(retry_after or 0, wait)
+        return retry_after
+
+    def succeeded(self, email):
+        if self.enabled:
+            self.store.reset(self._key('email', self._normalize_email(email)))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+login_throttle = LoginThrottle()
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from app import db
 from app.models import User, Site, Dossier
+from app.dossiers import apply_transition
 
 admin_bp = Blueprint('admin', __name__, template_folder='templates')
 
@@ -93,11 +94,10 @@ def update_dossier_status(dossier_id):
         flash("Accès refusé.", "danger")
         return redirect(url_for('admin.sub_dashboard'))
 
-    new_status = request.form.get('status')
-    if new_status not in ['déposé', 'en cours', 'validé']:
+    # Mêmes statuts et transitions que sub_admin.update_status (app.dossiers)
+    if apply_transition(dossier, request.form.get('status'), current_user) != 'updated':
         flash("Statut invalide", "warning")
     else:
-        dossier.status = new_status
         db.session.commit()
         flash("Statut mis à jour", "success")
 
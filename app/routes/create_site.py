@@ -1,6 +1,9 @@
 import os
 from flask import Blueprint, request, redirect, url_for, flash, render_template, abort, current_app
 from werkzeug.utils import secure_filename
+from app.cache import site_cache
+from app.site_assets import site_logo_url
+from app.site_templates import render_site_template
 
 superadmin_bp = Blueprint('superadmin', __name__, template_folder='templates/super_admin')
 
@@ -53,23 +56,12 @@ def create_site():
 # --- Afficher site dynamique ---
 @superadmin_bp.route('/sites/<site_name>')
 def view_site(site_name):
-    # --- Vérification que le dossier existe ---
-    template_path = os.path.join(current_app.root_path, SITES_TEMPLATE_FOLDER, site_name, 'register.html')
-    if not os.path.exists(template_path):
+    site = site_cache.get(site_name)
+    if site is None:
         abort(404)
 
-    # --- Charger le contenu du template ---
-    with open(template_path, 'r', encoding='utf-8') as f:
-        template_content = f.read()
+    # --- Logo : métadonnées du site (pas de parcours du dossier static) ---
+    logo_url = site_logo_url(site)
 
-    # --- Chercher logo ---
-    logo_url = None
-    static_dir = os.path.join(current_app.root_path, SITES_STATIC_FOLDER, site_name)
-    if os.path.exists(static_dir):
-        files = [f for f in os.listdir(static_dir) if os.path.isfile(os.path.join(static_dir, f))]
-        if files:
-            logo_url = f'/static/sites/{site_name}/{files[0]}'
-
-    # --- Rendre le contenu avec render_template_string ---
-    from flask import render_template_string
-    return render_template_string(template_content, site_name=site_name, logo_url=logo_url)
+    # --- Template compilé une fois par version du site (pas de render_template_string) ---
+    return render_site_template(site, site_name=site.name, logo_url=logo_url)
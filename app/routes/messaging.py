@@ -1,29 +1,144 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, abort, current_app, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy import func, select
+from sqlalchemy.orm import defer, joinedload
 from app import db
-from app.models import User, Message
+from app.models import User, Site, Message, ArchivedMessage, ConversationMember
+from app.events import event_bus, format_event
+from app.mailbox import broadcast_message, deliver_message, find_message, mark_read, mark_thread_read, mailbox_counts, remove_message, \
+    search_recipients, visible_recipients
+from app.pagination import keyset_paginate
+from app.search import search_messages
+import time
 from datetime import datetime
 
 # Blueprint pour la messagerie
 messaging_bp = Blueprint('messaging', __name__, template_folder='messaging')
 
 
-# Boîte de réception : messages reçus par l'utilisateur connecté
+# Badge "non lus" de base.html : une lecture du compteur, seulement si le template l'affiche
+@messaging_bp.app_context_processor
+def inject_unread_count():
+    def unread_message_count():
+        if not current_user.is_authenticated:
+            return 0
+        return mailbox_counts(current_user.id)[1]
+    return {'unread_message_count': unread_message_count}
+
+
+# Boîte de réception : fils de l'utilisateur connecté, du plus récent au plus ancien
 @messaging_bp.route('/', methods=['GET'])
 @login_required
 def inbox():
-    messages = Message.query.filter_by(recipient_id=current_user.id).order_by(Message.timestamp.desc()).all()
-    return render_template('messaging/inbox.html', messages=messages)
+    # Une requête : participation + conversation + dernier message + expéditeur
+    threads = keyset_paginate(
+        ConversationMember.query.options(
+            joinedload(ConversationMember.conversation),
+            joinedload(ConversationMember.last_message).joinedload(Message.sender),
+        ).filter(ConversationMember.user_id == current_user.id),
+        [ConversationMember.last_message_at, ConversationMember.conversation_id], descending=True
+    )
+    inbox_count, unread_count = mailbox_counts(current_user.id)
+    return render_template('messaging/inbox.html', threads=threads,
+                           inbox_count=inbox_count, unread_count=unread_count)
+
+
+# Recherche dans les messages envoyés et reçus (archive comprise)
+@messaging_bp.route('/search', methods=['GET'])
+@login_required
+def search():
+    query = request.args.get('q', '')
+    results = search_messages(current_user.id, query)
+    if results is None:
+        return redirect(url_for('messaging.inbox'))
+    return render_template('messaging/search.html', query=query, results=results)
+
+
+# Flux SSE : nouveaux messages et compteur de non lus, sans recharger la page
+@messaging_bp.route('/stream', methods=['GET'])
+@login_required
+def stream():
+    user_id = current_user.id
+    unread = mailbox_counts(user_id)[1]
+    # La connexion reste ouverte : pas de connexion à la base gardée pendant l'attente
+    db.session.remove()
+    keepalive = current_app.config.get('EVENTS_KEEPALIVE', 15)
+    deadline = time.monotonic() + current_app.config.get('EVENTS_STREAM_TIMEOUT', 300)
+
+    def generate():
+        with event_bus.subscribe(user_id) as subscription:
+            yield 'retry: 5000\n' + format_event('unread', {'count': unread})
+            while time.monotonic() < deadline:
+                item = subscription.get(timeout=keepalive)
+                yield format_event(*item) if item else ': keepalive\n\n'
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # nginx : pas de mise en tampon
+    })
+
+
+def _visible_in_thread(model, conversation_id, user_id):
+    """
+    Messages du fil visibles par l'utilisateur : ceux qu'il a reçus ou envoyés,
+    mais une seule copie (la première) de chaque diffusion qu'il a envoyée, pas
+    une par destinataire ; un destinataire ne voit pas les copies des autres.
+    """
+    first_copies = select(func.min(model.id)).where(
+        model.conversation_id == conversation_id, model.sender_id == user_id, model.broadcast_id.is_not(None)
+    ).group_by(model.broadcast_id)
+    return (model.recipient_id == user_id) | (
+        (model.sender_id == user_id) & (model.broadcast_id.is_(None) | model.id.in_(first_copies))
+    )
+
+
+# Fil de discussion : messages paginés du plus récent au plus ancien
+@messaging_bp.route('/conversation/<int:conversation_id>', methods=['GET'])
+@login_required
+def view_thread(conversation_id):
+    member = ConversationMember.query.options(joinedload(ConversationMember.conversation)) \
+        .filter_by(conversation_id=conversation_id, user_id=current_user.id).first()
+    if member is None:
+        abort(404)
+    if member.unread_count and mark_thread_read(conversation_id, current_user.id):
+        db.session.commit()
+    messages = keyset_paginate(
+        Message.query.options(joinedload(Message.sender))
+        .filter(Message.conversation_id == conversation_id,
+                _visible_in_thread(Message, conversation_id, current_user.id)),
+        [Message.id], descending=True
+    )
+    # Fin de l'historique : messages archivés par la rétention (liens, sans les corps)
+    archived = []
+    if not messages.has_next:
+        archived = ArchivedMessage.query.options(
+            joinedload(ArchivedMessage.sender), defer(ArchivedMessage.compressed_body)
+        ).filter(
+            ArchivedMessage.conversation_id == conversation_id,
+            _visible_in_thread(ArchivedMessage, conversation_id, current_user.id),
+            # Diffusion envoyée, en partie archivée : une copie encore en boîte est déjà affichée
+            ArchivedMessage.broadcast_id.is_(None) | ArchivedMessage.broadcast_id.not_in(
+                select(Message.broadcast_id).where(Message.conversation_id == conversation_id,
+                                                   Message.sender_id == current_user.id,
+                                                   Message.broadcast_id.is_not(None))
+            )
+        ).order_by(ArchivedMessage.id.desc()).limit(100).all()
+    return render_template('messaging/thread.html', conversation=member.conversation,
+                           messages=messages, archived=archived)
 
 
 # Voir un message : uniquement si l'utilisateur est expéditeur ou destinataire
 @messaging_bp.route('/message/<int:msg_id>', methods=['GET'])
 @login_required
 def view_message(msg_id):
-    msg = Message.query.get_or_404(msg_id)
+    msg = find_message(msg_id)  # archivé par la rétention : relu depuis l'archive
+    if msg is None:
+        abort(404)
     if msg.sender_id != current_user.id and msg.recipient_id != current_user.id:
         flash("Accès interdit", "danger")
         return redirect(url_for('messaging.inbox'))
+    if msg.recipient_id == current_user.id and not msg.archived and mark_read(msg):
+        db.session.commit()
     return render_template('messaging/message.html', message=msg)
 
 
@@ -31,17 +146,23 @@ def view_message(msg_id):
 @messaging_bp.route('/compose', methods=['GET', 'POST'])
 @login_required
 def compose():
-    # Récupère tous les utilisateurs sauf celui connecté
-    users = User.query.filter(User.id != current_user.id).order_by(User.role.desc(), User.username).all()
-
-    # Organiser les utilisateurs par rôle
-    roles_dict = {'super_admin': [], 'sub_admin': [], 'user': []}
-    for u in users:
-        roles_dict[u.role].append(u)
-
     if request.method == 'POST':
-        recipient_id = int(request.form['recipient_id'])
-        recipient = User.query.get(recipient_id)
+        # Réponse : même fil, destinataire = l'autre participant du message d'origine
+        reply_to = None
+        if request.form.get('reply_to'):
+            reply_to = db.session.get(Message, request.form.get('reply_to', type=int))
+            if reply_to is None or current_user.id not in (reply_to.sender_id, reply_to.recipient_id):
+                abort(404)
+            recipient_id = reply_to.recipient_id if reply_to.sender_id == current_user.id \
+                else reply_to.sender_id
+            recipient = db.session.get(User, recipient_id)
+        else:
+            # Nouveau fil : seulement parmi les destinataires proposés par la recherche
+            recipient = User.query.filter(
+                User.id == request.form.get('recipient_id', type=int),
+                User.id != current_user.id,
+                visible_recipients(current_user),
+            ).first()
         if not recipient:
             flash("Destinataire introuvable", "danger")
             return redirect(url_for('messaging.compose'))
@@ -49,16 +170,69 @@ def compose():
         new_message = Message(
             sender_id=current_user.id,
             recipient_id=recipient.id,
-            subject=request.form['subject'],
+            subject=request.form.get('subject') or (reply_to.conversation.subject if reply_to else ''),
             body=request.form['body'],
             timestamp=datetime.utcnow()
         )
-        db.session.add(new_message)
+        deliver_message(new_message, reply_to=reply_to)
         db.session.commit()
         flash("Message envoyé !", "success")
+        if reply_to is not None:
+            return redirect(url_for('messaging.view_thread', conversation_id=new_message.conversation_id))
         return redirect(url_for('messaging.inbox'))
 
-    return render_template('messaging/compose.html', roles_dict=roles_dict)
+    return render_template('messaging/compose.html')
+
+
+# Recherche de destinataires (saisie semi-automatique du formulaire de composition)
+@messaging_bp.route('/recipients', methods=['GET'])
+@login_required
+def recipients():
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 20)
+    role = request.args.get('role')
+    if role not in ('super_admin', 'sub_admin', 'user'):
+        role = None
+    rows = search_recipients(current_user, request.args.get('q', ''), role=role, limit=limit)
+    return jsonify(results=[{'id': row.id, 'username': row.username, 'role': row.role} for row in rows])
+
+
+# Diffusion à tous les utilisateurs d'un site ou d'un rôle (admins uniquement)
+def _broadcast_recipients(target):
+    """select des id destinataires de `target` ("site:<id>" ou "role:<rôle>"), selon les droits"""
+    kind, _, value = target.partition(':')
+    if kind == 'site' and value.isdigit():
+        site_id = int(value)
+        if current_user.role == 'sub_admin' and site_id != current_user.site_id:
+            abort(403)
+        return select(User.id).where(User.site_id == site_id)
+    if kind == 'role' and value in ('sub_admin', 'user') and current_user.role == 'super_admin':
+        return select(User.id).where(User.role == value)
+    abort(400)
+
+
+@messaging_bp.route('/broadcast', methods=['GET', 'POST'])
+@login_required
+def broadcast():
+    if current_user.role not in ('super_admin', 'sub_admin'):
+        abort(403)
+
+    if request.method == 'POST':
+        target = request.form.get('target', '')
+        subject, body = request.form.get('subject', '').strip(), request.form.get('body', '').strip()
+        if not subject or not body:
+            flash("Objet et message obligatoires.", "danger")
+            return redirect(url_for('messaging.broadcast'))
+        sent = broadcast_message(current_user.id, subject, body, _broadcast_recipients(target), target)
+        db.session.commit()
+        flash(f"Message diffusé à {sent.recipient_count} destinataire(s).", "success")
+        return redirect(url_for('messaging.inbox'))
+
+    if current_user.role == 'super_admin':
+        sites = Site.query.order_by(Site.name).all()
+    else:
+        sites = Site.query.filter_by(id=current_user.site_id).all()
+    return render_template('messaging/broadcast.html', sites=sites)
+
 
 # Suppression d'un message
 @messaging_bp.route('/message/<int:msg_id>/delete', methods=['POST'])
@@ -71,7 +245,7 @@ def delete_message(msg_id):
         flash("Vous n'êtes pas autorisé à supprimer ce message.", "danger")
         return redirect(url_for('messaging.inbox'))
 
-    db.session.delete(msg)
+    remove_message(msg)
     db.session.commit()
     flash("Message supprimé avec succès.", "success")
     return redirect(url_for('messaging.inbox'))
@@ -1,7 +1,17 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, Response, jsonify, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
 from app import db
-from app.models import User, Dossier, Site
+from app.models import User, Dossier, DossierTransition, Site, File, DRAFT_STATUS
+from app.pagination import keyset_paginate
+from app.cache import user_cache
+from app.csrf import csrf_valid
+from app.search import search_dossiers
+from app.dossiers import SUB_ADMIN_STATUSES, STATUS_LABELS, DELETED, MAX_BULK_DOSSIERS, apply_transition, \
+    bulk_delete, bulk_update_status, log_transition, next_statuses, status_timings
+from app.storage import send_stored_file
+from app.export import stream_zip, dossier_export_entries, site_export_entries
 
 sub_admin_bp = Blueprint('sub_admin', __name__)
 
@@ -14,6 +24,22 @@ def sub_admin_required(func):
         return func(*args, **kwargs)
     return wrapper
 
+# Machine à états des statuts, pour les listes déroulantes des templates
+@sub_admin_bp.context_processor
+def inject_workflow():
+    return {
+        'status_labels': STATUS_LABELS,
+        'sub_admin_statuses': SUB_ADMIN_STATUSES,
+        'next_statuses': lambda status: next_statuses(status, 'sub_admin'),
+    }
+
+TRANSITION_MESSAGES = {
+    'updated': ("Statut du dossier mis à jour.", "success"),
+    'unchanged': ("Le dossier a déjà ce statut.", "info"),
+    'invalid_transition': ("Changement de statut non autorisé.", "warning"),
+    'conflict': ("Le dossier a été modifié entre-temps, vérifiez son statut.", "warning"),
+}
+
 @sub_admin_bp.route('/', methods=['GET'])
 @login_required
 @sub_admin_required
@@ -22,7 +48,12 @@ def dashboard():
     if not site:
         flash("Aucun site assigné à votre compte. Contactez le super-admin.", "warning")
         return redirect(url_for('user.home'))
-    dossiers = Dossier.query.filter_by(site_id=site.id).all()
+    dossiers = keyset_paginate(
+        Dossier.query.options(joinedload(Dossier.user)).filter(
+            Dossier.site_id == site.id, Dossier.status != DRAFT_STATUS
+        ),
+        [Dossier.id], descending=True
+    )
     return render_template('sub_admin/dashboard.html', site=site, dossiers=dossiers)
 
 @sub_admin_bp.route('/dossier/<int:dossier_id>', methods=['GET'])
@@ -32,7 +63,48 @@ def view_dossier(dossier_id):
     dossier = Dossier.query.get_or_404(dossier_id)
     if dossier.site_id != current_user.site_id:
         abort(403)
-    return render_template('sub_admin/view_dossier.html', dossier=dossier)
+    if dossier.status == DRAFT_STATUS:
+        abort(404)
+    history = db.session.query(DossierTransition, User.username) \
+        .outerjoin(User, User.id == DossierTransition.actor_id) \
+        .filter(DossierTransition.dossier_id == dossier.id) \
+        .order_by(DossierTransition.id).all()
+    return render_template('sub_admin/view_dossier.html', dossier=dossier, history=history)
+
+@sub_admin_bp.route('/file/<int:file_id>', methods=['GET'])
+@login_required
+@sub_admin_required
+def download_file(file_id):
+    # Autorisation par site en une seule requête
+    record = File.query.join(Dossier).filter(
+        File.id == file_id,
+        Dossier.site_id == current_user.site_id,
+        Dossier.status != DRAFT_STATUS
+    ).first_or_404()
+    return send_stored_file(record, as_attachment=request.args.get('download') == '1')
+
+def _zip_response(entries, filename):
+    return Response(
+        stream_with_context(stream_zip(entries)),  # fichiers lus en base pendant l'envoi
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@sub_admin_bp.route('/dossier/<int:dossier_id>/export.zip', methods=['GET'])
+@login_required
+@sub_admin_required
+def export_dossier(dossier_id):
+    dossier = Dossier.query.get_or_404(dossier_id)
+    if dossier.site_id != current_user.site_id or dossier.status == DRAFT_STATUS:
+        abort(404)
+    return _zip_response(dossier_export_entries(dossier), f'dossier_{dossier.id}.zip')
+
+@sub_admin_bp.route('/export.zip', methods=['GET'])
+@login_required
+@sub_admin_required
+def export_site():
+    site = Site.query.get_or_404(current_user.site_id)
+    return _zip_response(site_export_entries(site.id), f'{site.slug}_dossiers.zip')
 
 @sub_admin_bp.route('/dossier/<int:dossier_id>/status', methods=['POST'])
 @login_required
@@ -41,24 +113,79 @@ def update_status(dossier_id):
     dossier = Dossier.query.get_or_404(dossier_id)
     if dossier.site_id != current_user.site_id:
         abort(403)
-    new_status = request.form.get('status')
-    if new_status in ['déposé', 'en cours de décision', 'validé']:
-        dossier.status = new_status
-        db.session.commit()
-        flash("Statut du dossier mis à jour.", "success")
+    if dossier.status == DRAFT_STATUS:
+        abort(404)
+    result = apply_transition(dossier, request.form.get('status'), current_user,
+                              version=request.form.get('version', type=int))
+    if result == 'updated':
+        try:
+            db.session.commit()
+        except StaleDataError:
+            # Modifié par un autre sous-admin entre la lecture et l'écriture
+            db.session.rollback()
+            result = 'conflict'
+    flash(*TRANSITION_MESSAGES[result])
+    return redirect(url_for('sub_admin.dashboard'))
+
+# Statut ou suppression de plusieurs dossiers : JSON {"ids": [...], "action":
+# "status" | "delete", "status": ...} -> résultat par id, ou formulaire du dashboard
+@sub_admin_bp.route('/dossiers/bulk', methods=['POST'])
+@login_required
+@sub_admin_required
+def bulk_dossiers():
+    data = request.get_json(silent=True) if request.is_json else None
+    if data is not None:
+        raw_ids, action, status = data.get('ids') or [], data.get('action'), data.get('status')
+        raw_versions = data.get('versions') or {}
+    else:
+        # Formulaire du dashboard : jeton CSRF exigé (le JSON passe par un preflight CORS)
+        if not csrf_valid():
+            flash("Session expirée, veuillez réessayer.", "danger")
+            return redirect(url_for('sub_admin.dashboard'))
+        raw_ids = request.form.getlist('ids')
+        action, status = request.form.get('action'), request.form.get('status')
+        raw_versions = {}
+    try:
+        ids = list(dict.fromkeys(int(i) for i in raw_ids))
+        versions = {int(i): int(v) for i, v in dict(raw_versions).items()}
+    except (TypeError, ValueError):
+        ids = None
+    if not ids or len(ids) > MAX_BULK_DOSSIERS or action not in ('status', 'delete') \
+            or (action == 'status' and status not in SUB_ADMIN_STATUSES):
+        if data is not None:
+            return jsonify(error="Requête invalide"), 400
+        flash("Sélectionnez des dossiers et une action.", "warning")
+        return redirect(url_for('sub_admin.dashboard'))
+
+    if action == 'delete':
+        results = bulk_delete(current_user.site_id, ids, current_user)
+    else:
+        results = bulk_update_status(current_user.site_id, ids, status, current_user, versions)
+    db.session.commit()
+
+    if data is not None:
+        return jsonify(results={str(i): result for i, result in results.items()})
+    done = sum(result in ('updated', 'deleted') for result in results.values())
+    flash(f"{done} dossier(s) {'supprimé(s)' if action == 'delete' else 'mis à jour'}.", "success")
+    refused = sum(result in ('invalid_transition', 'conflict') for result in results.values())
+    if refused:
+        flash(f"{refused} dossier(s) non modifié(s) : transition non autorisée ou modification concurrente.", "warning")
     return redirect(url_for('sub_admin.dashboard'))
 
+# Durées moyennes par statut (journal des transitions du site)
+@sub_admin_bp.route('/stats/status-timings', methods=['GET'])
+@login_required
+@sub_admin_required
+def status_timings_stats():
+    return jsonify(status_timings(current_user.site_id))
+
 @sub_admin_bp.route('/search', methods=['GET'])
 @login_required
 @sub_admin_required
 def search():
     query = request.args.get('q', '')
     site_id = current_user.site_id
-    dossiers = Dossier.query.filter(
-        Dossier.site_id == site_id,
-        (Dossier.title.ilike(f'%{query}%')) |
-        (Dossier.content.ilike(f'%{query}%'))
-    ).all()
+    dossiers = search_dossiers(site_id, query)
     site = Site.query.get(site_id)
     return render_template('sub_admin/dashboard.html', site=site, dossiers=dossiers)
 
@@ -73,6 +200,7 @@ def reset_user_password(user_id):
     if new_password:
         user.set_password(new_password)
         db.session.commit()
+        user_cache.invalidate(user.id)
         flash("Mot de passe réinitialisé.", "success")
     return redirect(url_for('sub_admin.dashboard'))
 
@@ -83,6 +211,9 @@ def delete_dossier(dossier_id):
     dossier = Dossier.query.get_or_404(dossier_id)
     if dossier.site_id != current_user.site_id:
         abort(403)
+    if dossier.status == DRAFT_STATUS:
+        abort(404)
+    log_transition(db.session, dossier.id, dossier.site_id, current_user.id, dossier.status, DELETED)
     db.session.delete(dossier)
     db.session.commit()
     flash("Dossier supprimé.", "success")
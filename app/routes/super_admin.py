@@ -1,11 +1,18 @@
-import os
 from functools import wraps
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort, jsonify
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
+from jinja2 import TemplateSyntaxError
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models import Site, User
-from app.forms import SiteForm, UserForm
+from app.forms import SiteForm, UserForm, RegistrationForm
+from app.pagination import keyset_paginate
+from app.cache import site_cache, user_cache
+from app.ratelimit import login_throttle
+from app.site_assets import logo_asset_paths, remove_site_assets, save_site_logo, site_logo_image
+from app.site_templates import (
+    default_template_source, site_template_env, site_template_source, render_site_template, invalidate_site_template
+)
 
 super_admin_bp = Blueprint('super_admin', __name__, template_folder='templates/super_admin')
 
@@ -24,10 +31,18 @@ def super_admin_required(func):
 @login_required
 @super_admin_required
 def dashboard():
-    sites = Site.query.all()
-    users = User.query.all()
+    # Chargement anticipé des relations affichées dans le tableau (évite le N+1)
+    sites = keyset_paginate(Site.query.options(joinedload(Site.sub_admin)), [Site.id], param='sites_')
+    users = keyset_paginate(User.query.options(joinedload(User.site)), [User.id], param='users_')
     return render_template('super_admin/dashboard.html', sites=sites, users=users)
 
+# --- Compteurs de limitation des connexions (supervision) ---
+@super_admin_bp.route('/stats/login-throttle')
+@login_required
+@super_admin_required
+def login_throttle_stats():
+    return jsonify(login_throttle.stats())
+
 # --- Création Site ---
 @super_admin_bp.route('/site/create', methods=['GET', 'POST'])
 @login_required
@@ -44,37 +59,24 @@ def create_site():
             return redirect(request.url)
 
         # Création en base de données
+        # Création en base de données, avec une copie du formulaire de base
         site = Site(
             name=form.name.data,
             slug=form.slug.data,
-            sub_admin_id=form.sub_admin_id.data if form.sub_admin_id.data != 0 else None
+            sub_admin_id=form.sub_admin_id.data if form.sub_admin_id.data != 0 else None,
+            register_template=default_template_source()
         )
         db.session.add(site)
         db.session.commit()
 
-        # Création dossiers templates et static
-        site_slug = form.slug.data
-        template_folder = os.path.join(current_app.root_path, 'templates', 'sites', site_slug)
-        static_folder = os.path.join(current_app.root_path, 'static', 'sites', site_slug)
-        os.makedirs(template_folder, exist_ok=True)
-        os.makedirs(static_folder, exist_ok=True)
-
-        # Copier formulaire de base
-        base_form_path = os.path.join(current_app.root_path, 'templates', 'user', 'register.html')
-        new_form_path = os.path.join(template_folder, 'register.html')
-        if os.path.exists(base_form_path):
-            with open(base_form_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            with open(new_form_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-
-        # Upload logo
+        # Upload logo (métadonnées stockées sur le site)
         logo = request.files.get('logo')
         if logo and logo.filename != '':
-            ext = logo.filename.rsplit('.', 1)[1].lower()
-            if ext in {'png', 'jpg', 'jpeg', 'gif'}:
-                logo_filename = secure_filename(logo.filename)
-                logo.save(os.path.join(static_folder, logo_filename))
+            if save_site_logo(site, logo):
+                db.session.commit()
+            else:
+                flash("Logo ignoré : image invalide.", "warning")
+        site_cache.invalidate(site.slug)  # efface un éventuel "slug inconnu" en cache
 
         flash(f"Site {site.name} créé avec succès !", "success")
         return redirect(url_for('super_admin.dashboard'))
@@ -93,6 +95,7 @@ def edit_site(site_id):
 
     if request.method == 'GET':
         form.sub_admin_id.data = site.sub_admin_id or 0
+        form.register_template.data = site_template_source(site)
 
     if form.validate_on_submit():
         existing_site = Site.query.filter_by(slug=form.slug.data).first()
@@ -100,10 +103,25 @@ def edit_site(site_id):
             flash("Ce slug est déjà utilisé. Choisissez un autre.", "danger")
             return redirect(request.url)
 
+        register_template = form.register_template.data or default_template_source()
+        try:
+            site_template_env().parse(register_template)
+        except TemplateSyntaxError as e:
+            flash(f"Formulaire invalide (ligne {e.lineno}) : {e.message}", "danger")
+            return render_template('super_admin/create_site.html', form=form, site=site)
+
+        old_slug = site.slug
         site.name = form.name.data
         site.slug = form.slug.data
         site.sub_admin_id = form.sub_admin_id.data if form.sub_admin_id.data != 0 else None
+        site.register_template = register_template
+        site.template_version = (site.template_version or 0) + 1
+        logo = request.files.get('logo')
+        if logo and logo.filename != '' and not save_site_logo(site, logo):
+            flash("Logo ignoré : image invalide.", "warning")
         db.session.commit()
+        invalidate_site_template(site.id)
+        site_cache.invalidate(old_slug, site.slug)
         flash("Site modifié avec succès !", "success")
         return redirect(url_for('super_admin.dashboard'))
 
@@ -115,35 +133,30 @@ def edit_site(site_id):
 @super_admin_required
 def delete_site(site_id):
     site = Site.query.get_or_404(site_id)
+    slug = site.slug
+    # Les utilisateurs du site perdent leur site_id : identités en cache à rafraîchir
+    user_ids = [user.id for user in site.users]
+    logo_paths = logo_asset_paths(site)
     db.session.delete(site)
     db.session.commit()
+    # Fichiers supprimés une fois la suppression commitée
+    remove_site_assets(logo_paths)
+    invalidate_site_template(site_id)
+    site_cache.invalidate(slug)
+    user_cache.invalidate(*user_ids)
     flash("Site supprimé !", "success")
     return redirect(url_for('super_admin.dashboard'))
 
 # --- Afficher Site ---
 @super_admin_bp.route('/sites/<slug>')
 def view_site(slug):
-    site = Site.query.filter_by(slug=slug).first_or_404()
-    template_path = os.path.join('sites', slug, 'register.html')
-    full_template_path = os.path.join(current_app.root_path, 'templates', template_path)
-    if not os.path.exists(full_template_path):
-        abort(404)
-
-    # Chercher le logo si présent
-    site_logo = None
-    static_folder = os.path.join(current_app.root_path, 'static', 'sites', slug)
-    if os.path.exists(static_folder):
-        logos = [f for f in os.listdir(static_folder) if os.path.isfile(os.path.join(static_folder, f))]
-        if logos:
-            site_logo = url_for('static', filename=f'sites/{slug}/{logos[0]}')
-
-    return render_template(template_path, site=site, site_logo=site_logo)
+    site = site_cache.get_or_404(slug)
+    return render_site_template(site, site_logo=site_logo_image(site), form=RegistrationForm())
 
 # --- Redirection automatique /slug vers /sites/<slug> ---
 @super_admin_bp.route('/<slug>')
 def redirect_to_site(slug):
-    site = Site.query.filter_by(slug=slug).first()
-    if site:
+    if site_cache.get(slug):
         return redirect(url_for('super_admin.view_site', slug=slug))
     abort(404)
 
@@ -193,6 +206,7 @@ def edit_user(user_id):
         if form.password.data:
             user.set_password(form.password.data)
         db.session.commit()
+        user_cache.invalidate(user.id)
         flash("Utilisateur modifié avec succès !", "success")
         return redirect(url_for('super_admin.dashboard'))
 
@@ -208,5 +222,6 @@ def delete_user(user_id):
         return redirect(url_for('super_admin.dashboard'))
     db.session.delete(user)
     db.session.commit()
+    user_cache.invalidate(user_id)
     flash("Utilisateur supprimé !", "success")
     return redirect(url_for('super_admin.dashboard'))
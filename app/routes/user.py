@@ -1,10 +1,21 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+import os
+import secrets
+from datetime import datetime
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, abort, send_from_directory
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
-import os
 from app import db
-from app.models import User, Dossier, File, Site
+from app.models import User, Dossier, Site, File, UploadSession, DRAFT_STATUS
 from app.forms import LoginForm, RegistrationForm, DossierForm
+from app.cache import site_cache
+from app.csrf import csrf_valid
+from app.dossiers import submit_draft
+from app.ratelimit import login_throttle
+from app.site_assets import ASSET_MAX_AGE, site_logo_image
+from app.site_templates import render_site_template
+from app.storage import acquire_blob, blob_relpath, guess_mime_type
+from app.uploads import store_upload, PartialUpload, maybe_expire_upload_sessions
+from app.utils import allowed_file
 
 user_bp = Blueprint('user', __name__, template_folder='templates')
 
@@ -19,6 +30,15 @@ def home():
     else:
         return render_template('user/dashboard.html')
 
+def _throttled_login(form, retry_after, site=None):
+    # Rejet sans vérifier le mot de passe : aucun hash calculé
+    flash("Trop de tentatives de connexion. Réessayez dans quelques minutes.", "danger")
+    response = current_app.make_response(
+        (render_template('user/login.html', form=form, site=site), 429)
+    )
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
 # Login global
 @user_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -32,9 +52,14 @@ def login():
 
     form = LoginForm()
     if form.validate_on_submit():
+        retry_after = login_throttle.hit(request.remote_addr, form.email.data)
+        if retry_after:
+            return _throttled_login(form, retry_after)
         user = User.query.filter_by(email=form.email.data).first()
         if user and user.check_password(form.password.data):
+            login_throttle.succeeded(form.email.data)
             login_user(user)
+            db.session.commit()  # hash éventuellement recalculé (rehash)
             flash("Connexion réussie !", "success")
             if user.role == 'super_admin':
                 return redirect(url_for('super_admin.dashboard'))
@@ -81,15 +106,29 @@ def logout():
     flash("Déconnexion réussie !", "success")
     return redirect(url_for('user.login'))
 
+# Logos des sites : noms versionnés par hash, donc cache navigateur/CDN illimité
+@user_bp.route('/assets/sites/<path:filename>')
+def site_asset(filename):
+    response = send_from_directory(
+        os.path.join(current_app.static_folder, 'sites'), filename, max_age=ASSET_MAX_AGE
+    )
+    response.cache_control.immutable = True
+    return response
+
 # Login spécifique site
 @user_bp.route('/<slug>/login', methods=['GET', 'POST'])
 def site_login(slug):
-    site = Site.query.filter_by(slug=slug).first_or_404()
+    site = site_cache.get_or_404(slug)
     form = LoginForm()
     if form.validate_on_submit():
+        retry_after = login_throttle.hit(request.remote_addr, form.email.data)
+        if retry_after:
+            return _throttled_login(form, retry_after, site=site)
         user = User.query.filter_by(email=form.email.data, site_id=site.id).first()
         if user and user.check_password(form.password.data):
+            login_throttle.succeeded(form.email.data)
             login_user(user)
+            db.session.commit()  # hash éventuellement recalculé (rehash)
             flash("Connexion réussie !", "success")
             return redirect(url_for('user.home'))
         flash("Email ou mot de passe incorrect", "danger")
@@ -98,7 +137,7 @@ def site_login(slug):
 # Registration spécifique site
 @user_bp.route('/<slug>/register', methods=['GET', 'POST'])
 def site_register(slug):
-    site = Site.query.filter_by(slug=slug).first_or_404()
+    site = site_cache.get_or_404(slug)
     form = RegistrationForm()
     if form.validate_on_submit():
         if User.query.filter_by(email=form.email.data, site_id=site.id).first():
@@ -115,45 +154,200 @@ def site_register(slug):
         db.session.commit()
         flash("Inscription réussie !", "success")
         return redirect(url_for('user.site_login', slug=slug))
-    return render_template('user/register.html', form=form, site=site)
+    # Formulaire propre au site, compilé une fois par version
+    return render_site_template(site, form=form, site_logo=site_logo_image(site))
 
 @user_bp.route('/dossier/submit', methods=['GET', 'POST'])
 @login_required
 def submit_dossier():
     form = DossierForm()
+    form.site.choices = [(s.id, s.name) for s in Site.query.order_by(Site.name).all()]
     if form.validate_on_submit():
-        # Créer le dossier
+        # Les fichiers sont déjà sur disque (UploadRequest), sans être encore rattachés
+        files = [f for f in request.files.getlist(form.files.name) if f.filename]
+        rejected = [f.filename for f in files if not allowed_file(f.filename)]
+        if rejected:
+            flash("Type de fichier non autorisé : " + ", ".join(rejected), "danger")
+            return render_template('user/submit_dossier.html', form=form)
+
         new_dossier = Dossier(
             first_name=form.first_name.data,
             last_name=form.last_name.data,
             email=form.email.data,
             job_type=form.job_type.data,
-            site_id=form.site.data.id,  # selon comment ton SelectField renvoie le site
+            site_id=form.site.data,
             user_id=current_user.id
         )
         db.session.add(new_dossier)
-        db.session.commit()
+        db.session.flush()
 
-        # Gérer les fichiers uploadés
-        files = request.files.getlist(form.files.name)
-        upload_folder = os.path.join(current_app.root_path, 'uploads')
-        os.makedirs(upload_folder, exist_ok=True)
-
-        for f in files:
-            if f.filename:
-                filename = secure_filename(f.filename)
-                filepath = os.path.join(upload_folder, filename)
-                f.save(filepath)
-                # Ajouter en base
-                file_record = File(
-                    filename=filename,
-                    path=filepath,
-                    dossier_id=new_dossier.id
-                )
-                db.session.add(file_record)
+        # Dossier et fichiers commités ensemble, une fois tous les fichiers en place
+        try:
+            for f in files:
+                db.session.add(store_upload(f, new_dossier.id))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
 
-        db.session.commit()
         flash("Dossier soumis avec succès !", "success")
         return redirect(url_for('user.home'))
 
     return render_template('user/submit_dossier.html', form=form)
+
+
+# -------------------------------
+# Uploads reprenables : brouillon -> init -> morceaux -> finalisation -> dépôt
+# -------------------------------
+# Jeton CSRF (celui du formulaire de dépôt) : champ csrf_token pour la
+# création du brouillon, en-tête X-CSRFToken pour le dépôt. Les autres
+# appels sont en JSON ou visent un upload_id aléatoire.
+
+def _own_draft(dossier_id):
+    dossier = Dossier.query.get_or_404(dossier_id)
+    if dossier.user_id != current_user.id or dossier.status != DRAFT_STATUS:
+        abort(403)
+    return dossier
+
+
+def _own_upload(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if not upload or upload.user_id != current_user.id:
+        abort(404)
+    return upload
+
+
+def _upload_state(upload):
+    return {
+        'upload_id': upload.id,
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.received,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_MAX_SIZE'],
+    }
+
+
+@user_bp.route('/dossier/draft', methods=['POST'])
+@login_required
+def create_draft_dossier():
+    form = DossierForm()
+    form.site.choices = [(s.id, s.name) for s in Site.query.order_by(Site.name).all()]
+    if not form.validate():
+        return jsonify(errors=form.errors), 400
+    dossier = Dossier(
+        first_name=form.first_name.data,
+        last_name=form.last_name.data,
+        email=form.email.data,
+        job_type=form.job_type.data,
+        site_id=form.site.data,
+        user_id=current_user.id,
+        status=DRAFT_STATUS
+    )
+    db.session.add(dossier)
+    db.session.commit()
+    return jsonify(dossier_id=dossier.id), 201
+
+
+@user_bp.route('/dossier/<int:dossier_id>/uploads', methods=['POST'])
+@login_required
+def init_upload(dossier_id):
+    dossier = _own_draft(dossier_id)
+    maybe_expire_upload_sessions()
+
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    if not filename or not allowed_file(filename):
+        return jsonify(error="Type de fichier non autorisé"), 400
+    if not isinstance(size, int) or size < 0 or size > current_app.config['UPLOAD_MAX_FILE_SIZE']:
+        return jsonify(error="Taille de fichier invalide"), 413
+
+    upload = UploadSession(
+        id=secrets.token_hex(16),
+        dossier_id=dossier.id,
+        user_id=current_user.id,
+        filename=filename,
+        mime_type=guess_mime_type(filename, data.get('mime_type')),
+        size=size
+    )
+    PartialUpload(upload.id).create()
+    db.session.add(upload)
+    db.session.commit()
+    return jsonify(_upload_state(upload)), 201
+
+
+@user_bp.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+def upload_status(upload_id):
+    # Permet au client de reprendre à l'offset déjà reçu après une coupure
+    return jsonify(_upload_state(_own_upload(upload_id)))
+
+
+@user_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+def upload_chunk(upload_id):
+    upload = _own_upload(upload_id)
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        offset = request.args.get('offset', type=int)
+    if offset != upload.received:
+        # Morceau hors séquence : le client doit reprendre à l'offset renvoyé
+        return jsonify(_upload_state(upload)), 409
+
+    max_length = min(current_app.config['UPLOAD_CHUNK_MAX_SIZE'], upload.size - offset)
+    written = PartialUpload(upload.id).write_at(offset, request.stream, max_length)
+
+    # Avance conditionnelle : un envoi concurrent du même morceau ne compte qu'une fois
+    advanced = UploadSession.query.filter_by(id=upload.id, received=offset).update(
+        {'received': offset + written, 'updated_at': datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+    db.session.refresh(upload)
+    return jsonify(_upload_state(upload)), (200 if advanced else 409)
+
+
+@user_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_upload(upload_id):
+    upload = _own_upload(upload_id)
+    partial = PartialUpload(upload.id)
+    if upload.received != upload.size or partial.size != upload.size:
+        return jsonify(_upload_state(upload)), 409
+
+    expected = (request.get_json(silent=True) or {}).get('checksum')
+    if expected and expected != partial.checksum:
+        # Contenu corrompu : on repart de zéro
+        partial.create()
+        upload.received = 0
+        db.session.commit()
+        return jsonify(error="Somme de contrôle invalide", **_upload_state(upload)), 422
+
+    size = partial.size
+    checksum = acquire_blob(partial, upload.mime_type)
+    record = File(
+        filename=upload.filename,
+        path=blob_relpath(checksum),
+        size=size,
+        checksum=checksum,
+        mime_type=upload.mime_type,
+        dossier_id=upload.dossier_id
+    )
+    db.session.add(record)
+    db.session.delete(upload)
+    db.session.commit()
+    return jsonify(file_id=record.id, filename=record.filename, checksum=checksum, size=size), 201
+
+
+@user_bp.route('/dossier/<int:dossier_id>/submit', methods=['POST'])
+@login_required
+def submit_draft_dossier(dossier_id):
+    if not csrf_valid():
+        return jsonify(error="Jeton CSRF manquant ou invalide"), 400
+    dossier = _own_draft(dossier_id)
+    if UploadSession.query.filter_by(dossier_id=dossier.id).first():
+        return jsonify(error="Des fichiers sont encore en cours d'envoi"), 409
+    if not submit_draft(dossier, current_user):
+        return jsonify(error="Ce dossier ne peut pas être déposé"), 409
+    db.session.commit()
+    return jsonify(dossier_id=dossier.id, status=dossier.status)
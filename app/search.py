@@ -0,0 +1,401 @@
+import re
+import zlib
+from sqlalchemy import event, func, insert, literal, literal_column, select, text, table, column, union, union_all, Integer, String
+from sqlalchemy.orm import defer, joinedload
+from app import db
+from app.models import ArchivedMessage, Broadcast, Dossier, File, Message, User, DRAFT_STATUS
+from app.pagination import keyset_paginate
+
+# -------------------------------
+# Recherche plein texte des dossiers (SQLite FTS5)
+# -------------------------------
+# Index : noms, email, type de métier et noms des fichiers déposés.
+# rowid = dossier.id ; site_id non indexé sert au filtrage par site.
+# Le contenu est maintenu par des triggers, y compris pour les UPDATE /
+# DELETE en masse qui ne passent pas par l'ORM.
+
+DOSSIER_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS dossier_fts USING fts5(
+        first_name, last_name, email, job_type, filenames,
+        site_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS dossier_fts_ai AFTER INSERT ON dossier BEGIN
+        INSERT INTO dossier_fts(rowid, first_name, last_name, email, job_type, filenames, site_id)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.job_type,
+                (SELECT group_concat(filename, ' ') FROM file WHERE dossier_id = new.id),
+                new.site_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS dossier_fts_au
+    AFTER UPDATE OF first_name, last_name, email, job_type, site_id ON dossier BEGIN
+        UPDATE dossier_fts SET first_name = new.first_name, last_name = new.last_name,
+            email = new.email, job_type = new.job_type, site_id = new.site_id
+        WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS dossier_fts_ad AFTER DELETE ON dossier BEGIN
+        DELETE FROM dossier_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS dossier_fts_file_ai AFTER INSERT ON file BEGIN
+        UPDATE dossier_fts SET filenames =
+            (SELECT group_concat(filename, ' ') FROM file WHERE dossier_id = new.dossier_id)
+        WHERE rowid = new.dossier_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS dossier_fts_file_au AFTER UPDATE OF filename, dossier_id ON file BEGIN
+        UPDATE dossier_fts SET filenames =
+            (SELECT group_concat(filename, ' ') FROM file WHERE dossier_id = old.dossier_id)
+        WHERE rowid = old.dossier_id;
+        UPDATE dossier_fts SET filenames =
+            (SELECT group_concat(filename, ' ') FROM file WHERE dossier_id = new.dossier_id)
+        WHERE rowid = new.dossier_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS dossier_fts_file_ad AFTER DELETE ON file BEGIN
+        UPDATE dossier_fts SET filenames =
+            (SELECT group_concat(filename, ' ') FROM file WHERE dossier_id = old.dossier_id)
+        WHERE rowid = old.dossier_id;
+    END""",
+]
+
+DOSSIER_FTS_REBUILD = """
+    INSERT INTO dossier_fts(rowid, first_name, last_name, email, job_type, filenames, site_id)
+    SELECT d.id, d.first_name, d.last_name, d.email, d.job_type,
+           (SELECT group_concat(f.filename, ' ') FROM file f WHERE f.dossier_id = d.id),
+           d.site_id
+    FROM dossier d
+"""
+
+DOSSIER_FTS_TRIGGERS = [
+    'dossier_fts_ai', 'dossier_fts_au', 'dossier_fts_ad',
+    'dossier_fts_file_ai', 'dossier_fts_file_au', 'dossier_fts_file_ad',
+]
+
+dossier_fts = table('dossier_fts', column('rowid', Integer), column('site_id', Integer))
+
+
+def create_dossier_index(connection):
+    """Crée la table FTS5 et ses triggers, puis indexe les dossiers existants"""
+    if connection.dialect.name != 'sqlite':
+        return False
+    exists = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dossier_fts'"
+    )).first()
+    try:
+        for statement in DOSSIER_FTS_DDL:
+            connection.execute(text(statement))
+    except Exception:
+        # SQLite compilé sans FTS5 : la recherche utilisera le mode dégradé
+        return False
+    if not exists:
+        connection.execute(text(DOSSIER_FTS_REBUILD))
+    return True
+
+
+def drop_dossier_index(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    for trigger in DOSSIER_FTS_TRIGGERS:
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+    connection.execute(text('DROP TABLE IF EXISTS dossier_fts'))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_after_tables(target, connection, **kw):
+    create_dossier_index(connection)
+    create_message_index(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_before_tables(target, connection, **kw):
+    drop_dossier_index(connection)
+    drop_message_index(connection)
+
+
+def include_name(name, type_, parent_names):
+    """Filtre Alembic : les tables FTS5 (et leurs tables internes) sont hors modèles"""
+    if type_ == 'table':
+        return not (name.endswith('_fts') or '_fts_' in name)
+    return True
+
+
+def fts_enabled(name='dossier_fts'):
+    """Vrai si la base courante dispose de l'index FTS5 `name`"""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return False
+    cache = engine.__dict__.setdefault('_fts_enabled', {})
+    if name not in cache:
+        # Connexion de la session : le premier appel peut avoir lieu en pleine transaction
+        cache[name] = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+        ), {'name': name}).first() is not None
+    return cache[name]
+
+
+def build_match_query(query):
+    """
+    Transforme la saisie utilisateur en requête FTS5 sûre : chaque mot devient
+    un préfixe entre guillemets ("jean"* "peint"*), les termes sont combinés en ET.
+    """
+    terms = re.findall(r'\w+', query or '')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_dossiers(site_id, query, param=''):
+    """
+    Recherche paginée des dossiers d'un site, triée par pertinence (bm25)
+    avec FTS5, sinon par id décroissant avec un filtre LIKE.
+    """
+    match = build_match_query(query)
+    if not match:
+        return keyset_paginate(
+            Dossier.query.options(joinedload(Dossier.user)).filter(
+                Dossier.site_id == site_id, Dossier.status != DRAFT_STATUS
+            ),
+            [Dossier.id], param=param, descending=True
+        )
+
+    if not fts_enabled():
+        return _search_dossiers_like(site_id, query, param)
+
+    hits = select(
+        dossier_fts.c.rowid.label('dossier_id'),
+        func.bm25(literal_column('dossier_fts')).label('score'),
+    ).where(
+        literal_column('dossier_fts').op('MATCH')(match),
+        dossier_fts.c.site_id == site_id,
+        dossier_fts.c.rowid.not_in(select(Dossier.id).where(Dossier.status == DRAFT_STATUS)),
+    ).subquery()
+
+    # bm25 : plus le score est bas, plus le résultat est pertinent
+    page = keyset_paginate(
+        db.session.query(hits.c.score, hits.c.dossier_id),
+        [hits.c.score, hits.c.dossier_id], param=param
+    )
+    ids = [row.dossier_id for row in page.items]
+    dossiers = {
+        d.id: d for d in
+        Dossier.query.options(joinedload(Dossier.user)).filter(Dossier.id.in_(ids)).all()
+    } if ids else {}
+    page.items = [dossiers[i] for i in ids if i in dossiers]
+    return page
+
+
+def _search_dossiers_like(site_id, query, param):
+    """Mode dégradé (bases autres que SQLite) : LIKE sur les mêmes champs"""
+    pattern = f'%{query}%'
+    return keyset_paginate(
+        Dossier.query.options(joinedload(Dossier.user)).filter(
+            Dossier.site_id == site_id,
+            Dossier.status != DRAFT_STATUS,
+            Dossier.first_name.ilike(pattern) |
+            Dossier.last_name.ilike(pattern) |
+            Dossier.email.ilike(pattern) |
+            Dossier.job_type.ilike(pattern) |
+            Dossier.files.any(File.filename.ilike(pattern))
+        ),
+        [Dossier.id], param=param, descending=True
+    )
+
+
+# -------------------------------
+# Recherche dans la messagerie (SQLite FTS5)
+# -------------------------------
+# Index : objet, corps et nom de l'expéditeur. rowid = message.id, qui ne
+# change pas à l'archivage (le document reste valable) ; une diffusion est
+# indexée une seule fois sous rowid = -broadcast.id. La colonne
+# `participants` ("u<id>" expéditeur et destinataire, expéditeur seul pour
+# une diffusion) restreint la recherche aux messages de l'utilisateur dans
+# l'index même ; les diffusions reçues sont filtrées après le MATCH, par
+# leurs copies. Tenu à jour par app.mailbox (envoi, diffusion, suppression) :
+# les corps archivés sont compressés, hors de portée d'un trigger.
+
+MESSAGE_FTS_DDL = """CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+    subject, body, sender, participants,
+    tokenize = 'unicode61 remove_diacritics 2'
+)"""
+
+MESSAGE_FTS_REBUILD = [
+    """INSERT INTO message_fts(rowid, subject, body, sender, participants)
+    SELECT m.id, m.subject, m.body, u.username, 'u' || m.sender_id || ' u' || m.recipient_id
+    FROM message m JOIN "user" u ON u.id = m.sender_id
+    WHERE m.broadcast_id IS NULL""",
+    """INSERT INTO message_fts(rowid, subject, body, sender, participants)
+    SELECT -b.id, b.subject, b.body, u.username, 'u' || b.sender_id
+    FROM broadcast b JOIN "user" u ON u.id = b.sender_id""",
+]
+
+MESSAGE_FTS_ARCHIVE_BATCH = """
+    SELECT a.id, a.subject, a.compressed_body, u.username, a.sender_id, a.recipient_id
+    FROM message_archive a JOIN "user" u ON u.id = a.sender_id
+    WHERE a.broadcast_id IS NULL AND a.id > :last_id
+    ORDER BY a.id LIMIT 1000
+"""
+
+message_fts = table(
+    'message_fts', column('rowid', Integer), column('subject', String), column('body', String),
+    column('sender', String), column('participants', String),
+)
+
+
+def create_message_index(connection):
+    """
+    Crée la table FTS5 de la messagerie, vide (create_all() des tests) ; la
+    migration 9e4f2b6a1c83 l'indexe ensuite avec rebuild_message_index.
+    """
+    if connection.dialect.name != 'sqlite':
+        return False
+    try:
+        connection.execute(text(MESSAGE_FTS_DDL))
+    except Exception:
+        return False  # SQLite compilé sans FTS5 : mode dégradé
+    return True
+
+
+def rebuild_message_index(connection):
+    """Réindexe tous les messages (archive comprise)"""
+    connection.execute(text('DELETE FROM message_fts'))
+    for statement in MESSAGE_FTS_REBUILD:
+        connection.execute(text(statement))
+    last_id = 0
+    while True:
+        rows = connection.execute(text(MESSAGE_FTS_ARCHIVE_BATCH), {'last_id': last_id}).all()
+        if not rows:
+            break
+        connection.execute(insert(message_fts), [
+            {
+                'rowid': row.id, 'subject': row.subject, 'sender': row.username,
+                'body': zlib.decompress(row.compressed_body).decode('utf-8') if row.compressed_body else None,
+                'participants': f'u{row.sender_id} u{row.recipient_id}',
+            }
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+
+def drop_message_index(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.execute(text('DROP TABLE IF EXISTS message_fts'))
+
+
+def index_message(message):
+    """Indexe un message envoyé (après flush : id connu)"""
+    if not fts_enabled('message_fts'):
+        return
+    db.session.execute(insert(message_fts).from_select(
+        ['rowid', 'subject', 'body', 'sender', 'participants'],
+        select(literal(message.id), literal(message.subject), literal(message.body),
+               User.username, literal(f'u{message.sender_id} u{message.recipient_id}'))
+        .where(User.id == message.sender_id)
+    ))
+
+
+def index_broadcast(broadcast):
+    """Indexe une diffusion une fois, pour son expéditeur et tous ses destinataires"""
+    if not fts_enabled('message_fts'):
+        return
+    db.session.execute(insert(message_fts).from_select(
+        ['rowid', 'subject', 'body', 'sender', 'participants'],
+        select(literal(-broadcast.id), literal(broadcast.subject), literal(broadcast.body),
+               User.username, literal(f'u{broadcast.sender_id}'))
+        .where(User.id == broadcast.sender_id)
+    ))
+
+
+def unindex_messages(*message_ids):
+    if message_ids and fts_enabled('message_fts'):
+        db.session.execute(message_fts.delete().where(message_fts.c.rowid.in_(message_ids)))
+
+
+def _received_broadcasts(user_id):
+    """rowid FTS (-broadcast.id) des diffusions dont l'utilisateur garde une copie (boîte ou archive)"""
+    return union(
+        select(-Message.broadcast_id).where(Message.recipient_id == user_id, Message.broadcast_id.is_not(None)),
+        select(-ArchivedMessage.broadcast_id).where(
+            ArchivedMessage.recipient_id == user_id, ArchivedMessage.broadcast_id.is_not(None)),
+    )
+
+
+def _message_hits(expression, *conditions):
+    return select(
+        message_fts.c.rowid.label('message_id'),
+        func.bm25(literal_column('message_fts'), 3.0, 1.0, 2.0, 0.0).label('score'),
+    ).where(literal_column('message_fts').op('MATCH')(expression), *conditions)
+
+
+def _load_messages(model, condition, user_id):
+    """Messages (boîte ou archive) de l'utilisateur, sans les corps archivés"""
+    query = model.query.options(joinedload(model.sender)).filter(
+        condition, (model.sender_id == user_id) | (model.recipient_id == user_id))
+    if model is ArchivedMessage:
+        query = query.options(defer(ArchivedMessage.compressed_body))
+    return query.order_by(model.id).all()
+
+
+def _resolve_hits(rowids, user_id):
+    """rowid FTS -> message affiché (diffusion : la copie de l'utilisateur, ou la première pour l'expéditeur)"""
+    message_ids = [rowid for rowid in rowids if rowid > 0]
+    broadcast_ids = [-rowid for rowid in rowids if rowid < 0]
+    found = {}
+    for model in (Message, ArchivedMessage):
+        missing = [i for i in message_ids if i not in found]
+        if missing:
+            found.update((m.id, m) for m in _load_messages(model, model.id.in_(missing), user_id))
+    copies = {}
+    for model in (Message, ArchivedMessage):
+        missing = [i for i in broadcast_ids if -i not in copies]
+        if missing:
+            for m in _load_messages(model, model.broadcast_id.in_(missing), user_id):
+                best = copies.get(-m.broadcast_id)
+                if best is None or (m.recipient_id == user_id and best.recipient_id != user_id):
+                    copies[-m.broadcast_id] = m
+    found.update(copies)
+    return [found[rowid] for rowid in rowids if rowid in found]
+
+
+def search_messages(user_id, query, param=''):
+    """
+    Recherche paginée dans les messages envoyés et reçus par l'utilisateur
+    (archive comprise), triée par pertinence (bm25, objet favorisé) avec
+    FTS5, sinon par id décroissant avec un filtre LIKE. None si la requête est vide.
+    """
+    match = build_match_query(query)
+    if not match:
+        return None
+    if not fts_enabled('message_fts'):
+        return _search_messages_like(user_id, query, param)
+
+    # Messages envoyés ou reçus et diffusions envoyées : filtrés dans l'index ;
+    # diffusions reçues : filtrées après le MATCH (requête de taille fixe,
+    # quel que soit l'historique de la boîte)
+    content = f'{{subject body sender}} : ({match})'
+    # (l'expéditeur n'est jamais destinataire de sa diffusion : pas de doublon)
+    hits = union_all(
+        _message_hits(f'participants : "u{user_id}" AND {content}'),
+        _message_hits(content, message_fts.c.rowid < 0,
+                      message_fts.c.rowid.in_(_received_broadcasts(user_id))),
+    ).subquery()
+
+    page = keyset_paginate(
+        db.session.query(hits.c.score, hits.c.message_id),
+        [hits.c.score, hits.c.message_id], param=param
+    )
+    page.items = _resolve_hits([row.message_id for row in page.items], user_id)
+    return page
+
+
+def _search_messages_like(user_id, query, param):
+    """Mode dégradé (bases autres que SQLite) : LIKE sur la boîte, corps archivés exclus"""
+    pattern = f'%{query}%'
+    return keyset_paginate(
+        Message.query.options(joinedload(Message.sender)).outerjoin(Broadcast, Message.broadcast).filter(
+            (Message.sender_id == user_id) | (Message.recipient_id == user_id),
+            # Diffusion : l'expéditeur ne voit pas chaque copie en résultat
+            ~((Message.broadcast_id.is_not(None)) & (Message.sender_id == user_id)),
+            Message.subject.ilike(pattern) |
+            Message._body.ilike(pattern) |
+            Broadcast.body.ilike(pattern) |
+            Message.sender.has(User.username.ilike(pattern))
+        ),
+        [Message.id], param=param, descending=True
+    )
+
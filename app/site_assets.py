@@ -0,0 +1,172 @@
+import hashlib
+import io
+import os
+from flask import current_app, url_for
+from werkzeug.utils import secure_filename
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+LOGO_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+# Les logos ont un nom qui contient leur hash : l'URL change avec le contenu,
+# le navigateur (ou un CDN) peut donc les garder en cache indéfiniment.
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Largeurs des variantes générées (jamais au-delà de la taille d'origine)
+LOGO_WIDTHS = (128, 256, 512)
+LOGO_MAX_PIXELS = 40_000_000  # au-delà, refus avant décodage (bombe de décompression)
+
+
+def allowed_logo(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in LOGO_EXTENSIONS
+
+
+def site_static_folder(slug):
+    return os.path.join(current_app.static_folder, 'sites', secure_filename(slug))
+
+
+def save_site_logo(site, logo):
+    """
+    Valide le logo d'un site et en génère des variantes redimensionnées
+    (static/sites/<slug>/logo.<hash>.<largeur>.webp + PNG ou JPEG de repli),
+    sans métadonnées (EXIF, profils...). Renseigne les métadonnées sur le Site
+    (à commiter par l'appelant) ; l'original n'est pas conservé.
+    Renvoie False si le fichier n'est pas une image valide.
+    """
+    if not logo or not logo.filename or not allowed_logo(logo.filename):
+        return False
+
+    data = logo.read()
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+        # verify() laisse l'image inutilisable : on la rouvre pour la décoder
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width * image.height > LOGO_MAX_PIXELS:
+                return False
+            image = _normalize_logo(image)
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        return False
+
+    digest = hashlib.sha256(data).hexdigest()
+    has_alpha = image.mode == 'RGBA'
+    fallback_ext, fallback_format = ('png', 'PNG') if has_alpha else ('jpg', 'JPEG')
+    folder = site_static_folder(site.slug)
+    os.makedirs(folder, exist_ok=True)
+    prefix = f'logo.{digest[:16]}'
+
+    widths = sorted({w for w in LOGO_WIDTHS if w < image.width} | {min(image.width, LOGO_WIDTHS[-1])})
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        variant = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+        variant.save(os.path.join(folder, f'{prefix}.{width}.webp'), 'WEBP', quality=85, method=6)
+        if fallback_format == 'JPEG':
+            variant.save(os.path.join(folder, f'{prefix}.{width}.jpg'), 'JPEG',
+                         quality=85, optimize=True, progressive=True)
+        else:
+            variant.save(os.path.join(folder, f'{prefix}.{width}.png'), 'PNG', optimize=True)
+
+    previous = logo_asset_paths(site)
+    largest = f'{prefix}.{widths[-1]}.{fallback_ext}'
+    site.logo_path = f'sites/{secure_filename(site.slug)}/{largest}'
+    site.logo_hash = digest
+    site.logo_size = os.path.getsize(os.path.join(folder, largest))
+    site.logo_width = widths[-1]
+    site.logo_height = max(1, round(image.height * widths[-1] / image.width))
+    site.logo_mime = Image.MIME[fallback_format]
+    site.logo_variants = ','.join(str(w) for w in widths)
+    current = set(logo_asset_paths(site))
+    for path in previous:
+        if path not in current:
+            remove_static_asset(path)
+    return True
+
+
+def _normalize_logo(image):
+    """Première image (GIF animé), orientation EXIF appliquée, RGB(A) sans métadonnées"""
+    image.seek(0)
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or \
+        (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    if has_alpha and image.getextrema()[3][0] == 255:
+        image = image.convert('RGB')  # canal alpha entièrement opaque : JPEG suffit
+    image.info = {}
+    return image
+
+
+def _logo_variants(site):
+    """[(largeur, chemin WebP, chemin de repli)] relatifs à static/"""
+    variants = getattr(site, 'logo_variants', None)
+    if not site.logo_path or not variants:
+        return []
+    stem, _, ext = site.logo_path.rsplit('.', 2)
+    return [
+        (int(w), f'{stem}.{w}.webp', f'{stem}.{w}.{ext}')
+        for w in variants.split(',')
+    ]
+
+
+def logo_asset_paths(site):
+    """Tous les fichiers du logo courant (variantes, ou fichier unique des anciens logos)"""
+    variants = _logo_variants(site)
+    if variants:
+        return [path for _, webp, fallback in variants for path in (webp, fallback)]
+    return [site.logo_path] if site.logo_path else []
+
+
+def remove_static_asset(path):
+    full_path = os.path.join(current_app.static_folder, path)
+    if os.path.isfile(full_path):
+        os.unlink(full_path)
+
+
+def remove_site_assets(paths):
+    """Supprime les fichiers d'un site supprimé, puis leurs dossiers devenus vides"""
+    for path in paths:
+        remove_static_asset(path)
+    for folder in {os.path.dirname(path) for path in paths}:
+        try:
+            os.rmdir(os.path.join(current_app.static_folder, folder))
+        except OSError:
+            pass  # dossier absent ou contenant d'autres fichiers
+
+
+def site_logo_url(site):
+    """URL versionnée du logo, servie avec un cache long (voir user.site_asset)"""
+    if not site.logo_path:
+        return None
+    return _asset_url(site.logo_path)
+
+
+def _asset_url(path):
+    return url_for('user.site_asset', filename=path[len('sites/'):])
+
+
+class SiteLogo:
+    """
+    Logo prêt pour les templates : `{{ site_logo }}` donne l'URL de la plus
+    grande variante, `srcset` / `webp_srcset` les variantes pour <picture>.
+    """
+
+    def __init__(self, src, width=None, height=None, srcset=None, webp_srcset=None):
+        self.src = src
+        self.width = width
+        self.height = height
+        self.srcset = srcset
+        self.webp_srcset = webp_srcset
+
+    def __str__(self):
+        return self.src
+
+
+def site_logo_image(site):
+    if not site.logo_path:
+        return None
+    variants = _logo_variants(site)
+    return SiteLogo(
+        site_logo_url(site),
+        width=site.logo_width,
+        height=site.logo_height,
+        srcset=', '.join(f'{_asset_url(fallback)} {w}w' for w, _, fallback in variants) or None,
+        webp_srcset=', '.join(f'{_asset_url(webp)} {w}w' for w, webp, _ in variants) or None,
+    )
@@ -0,0 +1,76 @@
+import os
+from flask import current_app
+from jinja2.sandbox import SandboxedEnvironment
+from app import db
+from app.cache import LRUCache
+from app.models import Site
+
+DEFAULT_TEMPLATE = 'user/register.html'
+
+# Fonctions globales de l'application exposées aux formulaires de site (pas `config`)
+SANDBOX_GLOBALS = ('url_for', 'get_flashed_messages', 'csrf_token')
+
+# Templates Jinja compilés, clé (site_id, template_version) : une modification
+# du site incrémente la version, l'ancienne entrée n'est plus jamais lue.
+compiled_templates = LRUCache()
+
+
+def init_app(app):
+    compiled_templates.max_entries = app.config.get('SITE_TEMPLATE_CACHE_SIZE', 128)
+
+
+def site_template_env():
+    """
+    Environnement des formulaires de site : éditables depuis l'interface, ils
+    sont compilés en bac à sable (ni attributs internes Python ni code
+    arbitraire), avec le loader (extends 'base.html'), les filtres et les
+    fonctions de l'application.
+    """
+    env = current_app.extensions.get('site_templates')
+    if env is None:
+        app_env = current_app.jinja_env
+        env = SandboxedEnvironment(loader=app_env.loader, autoescape=app_env.autoescape)
+        env.filters.update(app_env.filters)
+        env.tests.update(app_env.tests)
+        env.globals.update({name: app_env.globals[name] for name in SANDBOX_GLOBALS if name in app_env.globals})
+        current_app.extensions['site_templates'] = env
+    return env
+
+
+def default_template_source():
+    """Source du formulaire d'inscription de base, copiée dans chaque nouveau site"""
+    source, _, _ = current_app.jinja_env.loader.get_source(current_app.jinja_env, DEFAULT_TEMPLATE)
+    return source
+
+
+def site_template_source(site):
+    source = db.session.query(Site.register_template).filter(Site.id == site.id).scalar()
+    if source:
+        return source
+    # Sites créés avant le stockage en base : copie sur disque, sinon formulaire par défaut
+    legacy_path = os.path.join(current_app.root_path, 'templates', 'sites', site.slug, 'register.html')
+    if os.path.isfile(legacy_path):
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return default_template_source()
+
+
+def get_site_template(site):
+    key = (site.id, site.template_version)
+    template = compiled_templates.get(key)
+    if template is None:
+        template = site_template_env().from_string(site_template_source(site))
+        compiled_templates.set(key, template)
+    return template
+
+
+def render_site_template(site, **context):
+    """Équivalent de render_template pour le formulaire du site, sans recompilation"""
+    template = get_site_template(site)
+    context.setdefault('site', site)
+    current_app.update_template_context(context)
+    return template.render(context)
+
+
+def invalidate_site_template(site_id):
+    compiled_templates.delete_where(lambda key: key[0] == site_id)
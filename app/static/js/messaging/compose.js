@@ -0,0 +1,105 @@
+// Choix du destinataire : recherche par préfixe (nom d'utilisateur ou email),
+// requête envoyée après une courte pause de saisie, réponses périmées ignorées
+document.addEventListener('DOMContentLoaded', () => {
+    const picker = document.querySelector('.recipient-picker');
+    if (!picker) {
+        return;
+    }
+    const input = picker.querySelector('#recipient-search');
+    const hidden = picker.querySelector('#recipient-id');
+    const list = picker.querySelector('.recipient-suggestions');
+    const roles = { super_admin: 'Super admin', sub_admin: 'Sous-admin', user: 'Utilisateur' };
+    let timer = null;
+    let controller = null;
+    let active = -1;
+
+    const close = () => {
+        list.hidden = true;
+        list.innerHTML = '';
+        active = -1;
+    };
+
+    const choose = (item) => {
+        hidden.value = item.dataset.id;
+        input.value = item.dataset.username;
+        input.setCustomValidity('');
+        close();
+    };
+
+    const highlight = (index) => {
+        const items = list.querySelectorAll('li');
+        if (!items.length) {
+            return;
+        }
+        active = (index + items.length) % items.length;
+        items.forEach((item, i) => item.classList.toggle('active', i === active));
+    };
+
+    const render = (results) => {
+        list.innerHTML = '';
+        results.forEach((result) => {
+            const item = document.createElement('li');
+            item.dataset.id = result.id;
+            item.dataset.username = result.username;
+            item.textContent = result.username;
+            const role = document.createElement('span');
+            role.className = 'role';
+            role.textContent = roles[result.role] || result.role;
+            item.appendChild(role);
+            item.addEventListener('mousedown', (event) => {
+                event.preventDefault();
+                choose(item);
+            });
+            list.appendChild(item);
+        });
+        active = -1;
+        list.hidden = results.length === 0;
+    };
+
+    const search = async (query) => {
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+        const url = `${picker.dataset.search}?q=${encodeURIComponent(query)}`;
+        try {
+            const response = await fetch(url, { signal: controller.signal });
+            if (response.ok) {
+                render((await response.json()).results);
+            }
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                close();
+            }
+        }
+    };
+
+    input.addEventListener('input', () => {
+        hidden.value = '';
+        input.setCustomValidity('Choisissez un destinataire dans la liste');
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            close();
+            return;
+        }
+        timer = setTimeout(() => search(query), 200);
+    });
+
+    input.addEventListener('keydown', (event) => {
+        if (list.hidden) {
+            return;
+        }
+        if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+            event.preventDefault();
+            highlight(active + (event.key === 'ArrowDown' ? 1 : -1));
+        } else if (event.key === 'Enter' && active >= 0) {
+            event.preventDefault();
+            choose(list.querySelectorAll('li')[active]);
+        } else if (event.key === 'Escape') {
+            close();
+        }
+    });
+
+    input.addEventListener('blur', close);
+});
@@ -1,8 +1,8 @@
-document.addEventListener('DOMContentLoaded', () => {
-    console.log('Messagerie chargée');
-
-    const form = document.querySelector('form');
-    form.addEventListener('submit', () => {
-        console.log('Message envoyé');
-    });
+// Boîte de réception : rechargée à l'arrivée d'un message (flux SSE de stream.js),
+// seulement sur la première page pour ne pas perdre la position de pagination
+document.addEventListener('messaging:message', () => {
+    const params = new URLSearchParams(window.location.search);
+    if (!params.has('after') && !params.has('before')) {
+        window.location.reload();
+    }
 });
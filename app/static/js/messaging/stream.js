@@ -0,0 +1,20 @@
+// Notifications de messagerie en temps réel (SSE) : badge des non lus et
+// événement "messaging:message" pour les pages qui veulent se mettre à jour
+document.addEventListener('DOMContentLoaded', () => {
+    const badge = document.getElementById('unread-badge');
+    if (!badge || !window.EventSource) {
+        return;
+    }
+
+    const source = new EventSource(badge.dataset.stream);
+
+    source.addEventListener('unread', (event) => {
+        const count = JSON.parse(event.data).count;
+        badge.textContent = count;
+        badge.hidden = count === 0;
+    });
+
+    source.addEventListener('message', (event) => {
+        document.dispatchEvent(new CustomEvent('messaging:message', { detail: JSON.parse(event.data) }));
+    });
+});
@@ -1,4 +1,14 @@
 // JS pour tableau dashboard sous-admin
 document.addEventListener('DOMContentLoaded', () => {
     console.log('Dashboard sous-admin chargé');
+
+    // Sélection des dossiers pour les actions en masse
+    const selectAll = document.getElementById('select-all');
+    if (selectAll) {
+        selectAll.addEventListener('change', () => {
+            document.querySelectorAll('input[name="ids"][form="bulk-form"]').forEach((box) => {
+                box.checked = selectAll.checked;
+            });
+        });
+    }
 });
@@ -0,0 +1,160 @@
+import mimetypes
+import os
+from collections import Counter
+from urllib.parse import quote
+from flask import current_app, request, send_file
+from sqlalchemy import event, exc, insert, update, delete
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Blob, File
+
+# -------------------------------
+# Stockage adressé par contenu des fichiers déposés
+# -------------------------------
+# Chaque contenu est stocké une seule fois sous blobs/ab/cd/<sha256> et
+# référencé par Blob.ref_count : un nouvel upload identique ne coûte aucun
+# disque, et le fichier n'est supprimé que lorsque plus aucun File n'y
+# fait référence.
+
+BLOB_FOLDER = 'blobs'
+
+
+def blob_relpath(checksum):
+    """Chemin relatif à UPLOAD_FOLDER, réparti sur deux niveaux de sous-dossiers"""
+    return os.path.join(BLOB_FOLDER, checksum[:2], checksum[2:4], checksum)
+
+
+def blob_fullpath(checksum):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], blob_relpath(checksum))
+
+
+def guess_mime_type(filename, fallback=None):
+    mime_type, _ = mimetypes.guess_type(filename)
+    return mime_type or fallback or 'application/octet-stream'
+
+
+def acquire_blob(stream, mime_type):
+    """
+    Ajoute une référence au blob du contenu de `stream` (StreamedUpload déjà
+    écrit) dans la transaction courante. Le fichier temporaire n'est conservé
+    que si le contenu n'est pas déjà sur disque.
+    """
+    checksum = stream.checksum
+    bumped = db.session.execute(
+        update(Blob).where(Blob.checksum == checksum).values(ref_count=Blob.ref_count + 1)
+    ).rowcount
+    if not bumped:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Blob).values(
+                    checksum=checksum, size=stream.size, mime_type=mime_type, ref_count=1
+                ))
+        except exc.IntegrityError:
+            # Même contenu inséré en parallèle par une autre requête
+            db.session.execute(
+                update(Blob).where(Blob.checksum == checksum).values(ref_count=Blob.ref_count + 1)
+            )
+
+    destination = blob_fullpath(checksum)
+    if os.path.exists(destination):
+        stream.close()
+    else:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        stream.commit(destination)
+    return checksum
+
+
+def reclaim_blobs(checksums):
+    """
+    Supprime les blobs qui ne sont plus référencés. Le fichier est effacé
+    avant le commit, pendant que la ligne supprimée bloque toute nouvelle
+    référence au même contenu.
+    """
+    for checksum in set(checksums):
+        with db.engine.begin() as connection:
+            deleted = connection.execute(
+                delete(Blob).where(Blob.checksum == checksum, Blob.ref_count <= 0)
+            ).rowcount
+            if deleted:
+                path = blob_fullpath(checksum)
+                if os.path.exists(path):
+                    os.unlink(path)
+
+
+def send_stored_file(record, as_attachment=False):
+    """
+    Réponse de téléchargement d'un File : ETag fort (SHA-256 du contenu),
+    If-None-Match / Range gérés par Werkzeug. Si DOWNLOAD_ACCEL_REDIRECT_PREFIX
+    est défini, nginx sert le fichier (X-Accel-Redirect) ; USE_X_SENDFILE
+    délègue à Apache/lighttpd ; sinon le fichier est passé au serveur WSGI
+    via wsgi.file_wrapper (sendfile quand il le supporte).
+    """
+    relpath = record.path or record.filename
+    full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], relpath)
+    mime_type = record.mime_type or guess_mime_type(record.filename)
+    prefix = current_app.config.get('DOWNLOAD_ACCEL_REDIRECT_PREFIX')
+
+    if prefix:
+        response = current_app.response_class(mimetype=mime_type)
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(relpath)
+        response.headers.set(
+            'Content-Disposition', 'attachment' if as_attachment else 'inline',
+            filename=record.filename
+        )
+        if record.checksum:
+            response.set_etag(record.checksum)
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            response.headers.pop('X-Accel-Redirect', None)
+    else:
+        response = send_file(
+            full_path,
+            mimetype=mime_type,
+            as_attachment=as_attachment,
+            download_name=record.filename,
+            etag=record.checksum or True,
+            conditional=True,
+            max_age=current_app.config.get('DOWNLOAD_MAX_AGE', 0)
+        )
+
+    # Contenu réservé aux sous-admins du site : jamais en cache partagé
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+
+# --- Décompte des références à la suppression des File ---
+
+@event.listens_for(Session, 'after_flush')
+def _release_deleted_files(session, flush_context):
+    released = [
+        obj.checksum for obj in session.deleted
+        if isinstance(obj, File) and obj.checksum and obj.path == blob_relpath(obj.checksum)
+    ]
+    if released:
+        release_blobs(session, released)
+
+
+def release_blobs(session, checksums):
+    """Retire une référence par checksum ; les blobs libérés sont récupérés après le commit"""
+    for checksum, count in Counter(checksums).items():
+        session.execute(
+            update(Blob).where(Blob.checksum == checksum).values(ref_count=Blob.ref_count - count)
+        )
+    session.info.setdefault('released_blobs', []).extend(checksums)
+
+
+@event.listens_for(Session, 'after_commit')
+def _reclaim_after_commit(session):
+    if session.in_nested_transaction():
+        return  # SAVEPOINT relâché : la transaction englobante n'est pas encore commitée
+    released = session.info.pop('released_blobs', None)
+    if released:
+        reclaim_blobs(released)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    if session.in_nested_transaction():
+        return  # retour à un SAVEPOINT : les libérations d'avant restent valables
+    session.info.pop('released_blobs', None)
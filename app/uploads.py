@@ -0,0 +1,208 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+from app import db
+from app.models import File, UploadSession
+from app.storage import acquire_blob, blob_relpath, guess_mime_type
+
+CHUNK_SIZE = 64 * 1024
+
+
+def upload_tmp_folder():
+    """Dossier temporaire sur le même disque que UPLOAD_FOLDER (os.replace sans copie)"""
+    folder = current_app.config.get('UPLOAD_TMP_FOLDER') or \
+        os.path.join(current_app.config['UPLOAD_FOLDER'], '.tmp')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+class StreamedUpload:
+    """
+    Fichier temporaire sur disque qui reçoit l'upload au fil de l'eau :
+    calcule le SHA-256 et la taille pendant l'écriture et refuse le fichier
+    dès qu'il dépasse `max_size`. Supprimé à la fermeture s'il n'a pas été
+    déplacé à sa place définitive via `commit()`.
+    """
+
+    def __init__(self, folder, max_size=None):
+        self._file = tempfile.NamedTemporaryFile(dir=folder, prefix='upload-', delete=False)
+        self.path = self._file.name
+        self.max_size = max_size
+        self.size = 0
+        self.committed = False
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.close()
+            raise RequestEntityTooLarge()
+        self._hash.update(data)
+        return self._file.write(data)
+
+    @property
+    def checksum(self):
+        return self._hash.hexdigest()
+
+    def commit(self, destination):
+        """Déplace le fichier complet vers `destination` (même système de fichiers)"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.path, destination)
+        self.committed = True
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.committed and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __getattr__(self, name):
+        # read / readline / seek / tell... délégués au fichier temporaire
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """
+    Requête dont les fichiers multipart sont écrits directement sur disque
+    par morceaux (au lieu du SpooledTemporaryFile de Werkzeug), à côté du
+    dossier d'uploads final.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Request.close() ferme ces flux en fin de requête : les fichiers
+        # temporaires non conservés sont alors supprimés
+        return StreamedUpload(
+            upload_tmp_folder(),
+            max_size=current_app.config.get('UPLOAD_MAX_FILE_SIZE')
+        )
+
+
+def store_upload(file, dossier_id):
+    """
+    Enregistre un fichier reçu dans le stockage par contenu et renvoie le
+    `File` correspondant (non ajouté à la session : l'appelant le commit
+    avec le dossier). En cas de rollback, le blob éventuellement écrit reste
+    sur disque sans référence et sera réutilisé par un upload identique.
+    """
+    stream = file.stream
+    if not isinstance(stream, StreamedUpload):
+        # Fichier non reçu via UploadRequest : copie par morceaux
+        staged = StreamedUpload(upload_tmp_folder(), current_app.config.get('UPLOAD_MAX_FILE_SIZE'))
+        try:
+            stream.seek(0)
+            shutil.copyfileobj(stream, staged, CHUNK_SIZE)
+        except Exception:
+            staged.close()
+            raise
+        stream = staged
+
+    filename = secure_filename(file.filename)
+    mime_type = guess_mime_type(filename, file.mimetype)
+    size = stream.size
+    checksum = acquire_blob(stream, mime_type)
+
+    return File(
+        filename=filename,
+        path=blob_relpath(checksum),
+        size=size,
+        checksum=checksum,
+        mime_type=mime_type,
+        dossier_id=dossier_id
+    )
+
+
+# -------------------------------
+# Uploads reprenables (init / morceau à un offset / finalisation)
+# -------------------------------
+
+class PartialUpload:
+    """Fichier assemblé morceau par morceau, avec la même interface que StreamedUpload"""
+
+    def __init__(self, upload_id):
+        self.path = os.path.join(upload_tmp_folder(), f'partial-{upload_id}')
+        self.committed = False
+        self._checksum = None
+
+    def create(self):
+        open(self.path, 'wb').close()
+
+    def write_at(self, offset, stream, max_length):
+        """Écrit le corps de la requête à `offset` ; renvoie le nombre d'octets reçus"""
+        written = 0
+        with open(self.path, 'r+b') as f:
+            f.seek(offset)
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_length:
+                    raise RequestEntityTooLarge()
+                f.write(chunk)
+            f.truncate(offset + written)
+        return written
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+    @property
+    def checksum(self):
+        if self._checksum is None:
+            digest = hashlib.sha256()
+            with open(self.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            self._checksum = digest.hexdigest()
+        return self._checksum
+
+    def commit(self, destination):
+        os.replace(self.path, destination)
+        self.committed = True
+
+    def close(self):
+        if not self.committed and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def session_ttl():
+    return current_app.config.get('UPLOAD_SESSION_TTL', timedelta(hours=24))
+
+
+def expire_upload_sessions(now=None):
+    """Supprime les uploads abandonnés (lignes et fichiers partiels) ; renvoie leur nombre"""
+    limit = (now or datetime.utcnow()) - session_ttl()
+    expired = UploadSession.query.filter(UploadSession.updated_at < limit).all()
+    for upload in expired:
+        PartialUpload(upload.id).close()
+        db.session.delete(upload)
+    db.session.commit()
+
+    # Fichiers partiels dont la ligne a disparu (ex. dossier brouillon supprimé)
+    folder = upload_tmp_folder()
+    cutoff = time.time() - session_ttl().total_seconds()
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.startswith('partial-') and os.path.getmtime(path) < cutoff \
+                and not db.session.get(UploadSession, name[len('partial-'):]):
+            os.unlink(path)
+    return len(expired)
+
+
+_last_sweep = [0.0]
+
+
+def maybe_expire_upload_sessions():
+    """Nettoyage opportuniste, au plus une fois par UPLOAD_SESSION_SWEEP_INTERVAL secondes"""
+    interval = current_app.config.get('UPLOAD_SESSION_SWEEP_INTERVAL', 600)
+    if time.monotonic() - _last_sweep[0] >= interval:
+        _last_sweep[0] = time.monotonic()
+        expire_upload_sessions()
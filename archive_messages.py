@@ -0,0 +1,35 @@
+"""
+Archivage des messages expirés (MESSAGE_RETENTION_DAYS), un commit par lot
+pour ne pas bloquer la base. À lancer périodiquement (cron).
+
+    python archive_messages.py [--batch-size 500] [--max-batches N]
+"""
+import argparse
+from datetime import datetime
+from app import create_app, db
+from app.mailbox import archive_messages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, help='messages par transaction')
+    parser.add_argument('--max-batches', type=int, help='arrêt après N lots')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        retention = app.config['MESSAGE_RETENTION_DAYS']
+        batch_size = args.batch_size or app.config['MESSAGE_ARCHIVE_BATCH_SIZE']
+        now, total, batches = datetime.utcnow(), 0, 0
+        while args.max_batches is None or batches < args.max_batches:
+            count = archive_messages(retention, batch_size, now=now)
+            db.session.commit()
+            if not count:
+                break
+            total += count
+            batches += 1
+        print(f'{total} message(s) archivé(s) en {batches} lot(s)')
+
+
+if __name__ == '__main__':
+    main()
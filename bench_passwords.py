@@ -0,0 +1,58 @@
+"""
+Débit de vérification des mots de passe (connexions/s, total et par cœur)
+avec la politique de hachage configurée.
+
+    python bench_passwords.py [--seconds 5] [--workers N] [--method scrypt:32768:8:1]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import create_app
+from app.passwords import password_hasher
+
+
+def login_loop(pwhash, deadline):
+    count = 0
+    while time.monotonic() < deadline:
+        password_hasher.verify(pwhash, 'motdepasse')
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--workers', type=int, help='taille du pool (0 : dans le thread appelant)')
+    parser.add_argument('--method', help='politique de hachage à mesurer')
+    args = parser.parse_args()
+
+    app = create_app()
+    if args.workers is not None:
+        app.config['PASSWORD_HASH_WORKERS'] = args.workers
+    if args.method:
+        app.config['PASSWORD_HASH_METHOD'] = args.method
+    password_hasher.init_app(app)
+
+    workers = app.config['PASSWORD_HASH_WORKERS']
+    cores = min(max(workers, 1), os.cpu_count() or 1)
+    pwhash = password_hasher.hash('motdepasse')
+    password_hasher.verify(pwhash, 'motdepasse')  # démarrage du pool hors mesure
+
+    # Autant de "requêtes" concurrentes que de processus de hachage
+    threads = max(workers, 1)
+    start = time.monotonic()
+    deadline = start + args.seconds
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        total = sum(pool.map(login_loop, [pwhash] * threads, [deadline] * threads))
+    elapsed = time.monotonic() - start
+
+    print(f'politique : {password_hasher.policy_prefix}')
+    print(f'pool : {workers or "aucun (dans la requête)"}, cœurs utilisés : {cores}')
+    print(f'{total} vérifications en {elapsed:.1f}s : {total / elapsed:.1f}/s, {total / elapsed / cores:.1f}/s par cœur')
+    password_hasher.shutdown()
+
+
+if __name__ == '__main__':
+    # Pool 'spawn' : le module principal est réimporté par les processus fils
+    main()
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 
 # dossier courant : app/
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -16,3 +17,65 @@ class Config:
 
     # Uploads dans app/instance/uploads
     UPLOAD_FOLDER = os.path.join(basedir, "instance", "uploads")
+
+    # Uploads écrits par morceaux sur disque : taille max par fichier et par requête
+    UPLOAD_MAX_FILE_SIZE = 50 * 1024 * 1024
+    MAX_CONTENT_LENGTH = 200 * 1024 * 1024
+
+    # Uploads reprenables : taille max d'un morceau, durée de vie d'un upload inactif
+    UPLOAD_CHUNK_MAX_SIZE = 8 * 1024 * 1024
+    UPLOAD_SESSION_TTL = timedelta(hours=24)
+    UPLOAD_SESSION_SWEEP_INTERVAL = 600
+
+    # Téléchargements : délégation au serveur web (nginx : préfixe de la
+    # location "internal" qui pointe sur UPLOAD_FOLDER ; Apache : USE_X_SENDFILE)
+    DOWNLOAD_ACCEL_REDIRECT_PREFIX = os.environ.get("DOWNLOAD_ACCEL_REDIRECT_PREFIX")
+    USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE") == "1"
+    DOWNLOAD_MAX_AGE = 0  # revalidation systématique via ETag
+
+    # Mots de passe : paramètres de coût (format Werkzeug, les hash existants
+    # sont recalculés à la connexion si la politique change) et taille du pool
+    # de processus dédié au hachage (0 : calcul dans le worker de la requête)
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_TIMEOUT = 30  # secondes
+
+    # Connexion : tentatives autorisées par IP et par email (nombre, fenêtre
+    # glissante en secondes), stockées selon CACHE_BACKEND
+    LOGIN_RATE_LIMIT_ENABLED = True
+    LOGIN_RATE_LIMIT_IP = (30, 60)
+    LOGIN_RATE_LIMIT_EMAIL = (10, 15 * 60)
+
+    # Reverse proxies (nginx...) devant l'application : nombre de proxies de
+    # confiance dont l'en-tête X-Forwarded-For donne l'IP du client (0 : aucun,
+    # request.remote_addr est l'adresse de la connexion). Derrière nginx sans
+    # ce réglage, tous les clients partagent l'IP du proxy et sa limite.
+    PROXY_FIX_X_FOR = int(os.environ.get("PROXY_FIX_X_FOR", "0"))
+
+    # Cache applicatif : 'memory' (par processus) ou 'redis' (partagé entre workers)
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    SITE_CACHE_TTL = 300  # secondes
+    SITE_CACHE_MISSING_TTL = 30  # slugs inconnus
+    USER_CACHE_TTL = 60  # identité des utilisateurs connectés (user_loader)
+    SITE_TEMPLATE_CACHE_SIZE = 128  # formulaires de site compilés gardés en mémoire
+
+    # Notifications temps réel (SSE) : relais entre processus 'memory' (un seul
+    # processus), 'database' (table message_event) ou 'redis' (CACHE_REDIS_URL).
+    # Flux ouvert sur les pages de la messagerie seulement ; chaque connexion y
+    # occupe un thread jusqu'à EVENTS_STREAM_TIMEOUT : serveur threadé ou gevent requis.
+    EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND", "memory")
+    EVENTS_POLL_INTERVAL = 1.0  # secondes, backend 'database'
+    EVENTS_RETENTION = 60  # secondes, backend 'database'
+    EVENTS_KEEPALIVE = 15  # commentaire SSE envoyé si rien ne se passe
+    EVENTS_STREAM_TIMEOUT = 300  # le navigateur se reconnecte ensuite
+
+    # Rétention de la messagerie : jours avant l'archivage des messages lus
+    # (table message_archive, corps compressés), selon le rôle du destinataire
+    # (None : jamais). Archivage par lots : python archive_messages.py (cron)
+    MESSAGE_RETENTION_DAYS = {'super_admin': None, 'sub_admin': 365, 'user': 180}
+    MESSAGE_ARCHIVE_BATCH_SIZE = 500
+
+    # Pagination par curseur des listes (dashboards, messagerie)
+    PAGINATION_PER_PAGE = 50
+    PAGINATION_MAX_PER_PAGE = 200
@@ -1,4 +1,5 @@
 import os
+from flask_migrate import stamp
 from app import create_app, db
 from app.models import User, Message, Dossier, Site, File  # ajoute Message ici
 
@@ -15,6 +16,7 @@ with app.app_context():
     # Supprime toutes les tables existantes et recrée-les
     db.drop_all()
     db.create_all()
+    stamp()  # schéma courant : les migrations suivantes partiront d'ici
     print("✅ Tables créées avec succès !")
 
     # Création du super admin si inexistant
@@ -0,0 +1,28 @@
+"""add site register template
+
+Revision ID: 0d8e4b7a2c65
+Revises: b62f1d9e0a37
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d8e4b7a2c65'
+down_revision = 'b62f1d9e0a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('register_template', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('template_version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.drop_column('template_version')
+        batch_op.drop_column('register_template')
@@ -0,0 +1,93 @@
+"""initial schema
+
+Revision ID: 1c0e7d5b9a24
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c0e7d5b9a24'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# Tables d'origine. Les bases créées avant les migrations (db.create_all()
+# au démarrage, comme instance/app.db) les ont déjà : if_not_exists, puis
+# les révisions suivantes s'appliquent normalement.
+def upgrade():
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=64), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=True),
+        sa.Column('role', sa.String(length=20), nullable=True),
+        sa.Column('site_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['site_id'], ['site.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username'),
+        sa.UniqueConstraint('email'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'site',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('slug', sa.String(length=50), nullable=False),
+        sa.Column('sub_admin_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['sub_admin_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+        sa.UniqueConstraint('slug'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'dossier',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('first_name', sa.String(length=50), nullable=False),
+        sa.Column('last_name', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('job_type', sa.String(length=100), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('site_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.ForeignKeyConstraint(['site_id'], ['site.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'file',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=200), nullable=False),
+        sa.Column('dossier_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['dossier_id'], ['dossier.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'message',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sender_id', sa.Integer(), nullable=False),
+        sa.Column('recipient_id', sa.Integer(), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['sender_id'], ['user.id']),
+        sa.ForeignKeyConstraint(['recipient_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('message')
+    op.drop_table('file')
+    op.drop_table('dossier')
+    op.drop_table('site')
+    op.drop_table('user')
@@ -0,0 +1,44 @@
+"""add message read state and mailbox counters
+
+Revision ID: 1f6a8c3e5b27
+Revises: 9c3f61a8e2d4
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f6a8c3e5b27'
+down_revision = '9c3f61a8e2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('read_at', sa.DateTime(), nullable=True))
+
+    op.create_table(
+        'mailbox_counter',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('inbox_count', sa.Integer(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Aucun état de lecture jusqu'ici : les messages existants sont considérés comme lus
+    op.execute("UPDATE message SET read_at = timestamp WHERE read_at IS NULL")
+    op.execute("DELETE FROM mailbox_counter")
+    op.execute(
+        "INSERT INTO mailbox_counter (user_id, inbox_count, unread_count) "
+        "SELECT recipient_id, COUNT(*), 0 FROM message GROUP BY recipient_id"
+    )
+
+
+def downgrade():
+    op.drop_table('mailbox_counter')
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_column('read_at')
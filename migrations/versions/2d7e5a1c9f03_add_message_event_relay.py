@@ -0,0 +1,35 @@
+"""add message event relay
+
+Revision ID: 2d7e5a1c9f03
+Revises: 6b9d0e4f2a81
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7e5a1c9f03'
+down_revision = '6b9d0e4f2a81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'message_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('origin', sa.String(length=16), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=20), nullable=False),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_message_event_created_at', 'message_event', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_message_event_created_at', table_name='message_event')
+    op.drop_table('message_event')
@@ -0,0 +1,29 @@
+"""add lower(username) / lower(email) indexes for recipient search
+
+Revision ID: 3b8e1f5c7a29
+Revises: 7a2c4f8e1d56
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e1f5c7a29'
+down_revision = '7a2c4f8e1d56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_username_lower', 'user', [sa.text('lower(username)')], unique=False)
+    op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')], unique=False)
+    if op.get_bind().dialect.name == 'sqlite':
+        # Statistiques à jour : le planificateur choisit l'index de préfixe
+        op.execute('ANALYZE "user"')
+
+
+def downgrade():
+    op.drop_index('ix_user_email_lower', table_name='user')
+    op.drop_index('ix_user_username_lower', table_name='user')
@@ -0,0 +1,42 @@
+"""add indexes on hot filter columns
+
+Revision ID: 3f2a9c1d7b10
+Revises: 1c0e7d5b9a24
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b10'
+down_revision = '1c0e7d5b9a24'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_user_role', 'user', ['role']),
+    ('ix_user_site_id', 'user', ['site_id']),
+    ('ix_user_email_site_id', 'user', ['email', 'site_id']),
+    ('ix_site_sub_admin_id', 'site', ['sub_admin_id']),
+    ('ix_dossier_status', 'dossier', ['status']),
+    ('ix_dossier_user_id', 'dossier', ['user_id']),
+    ('ix_dossier_site_id', 'dossier', ['site_id']),
+    ('ix_dossier_site_id_status', 'dossier', ['site_id', 'status']),
+    ('ix_file_dossier_id', 'file', ['dossier_id']),
+    ('ix_message_sender_id', 'message', ['sender_id']),
+    ('ix_message_recipient_id_timestamp', 'message',
+     ['recipient_id', sa.text('timestamp DESC'), sa.text('id DESC')]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,55 @@
+"""add dossier workflow: version and transition log
+
+Revision ID: 4d7b1e9a2f60
+Revises: 9e4f2b6a1c83
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d7b1e9a2f60'
+down_revision = '9e4f2b6a1c83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('dossier', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    # Un seul libellé pour le statut intermédiaire (l'admin écrivait 'en cours')
+    op.execute("UPDATE dossier SET status = 'en cours de décision' WHERE status = 'en cours'")
+
+    op.create_table(
+        'dossier_transition',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dossier_id', sa.Integer(), nullable=False),
+        sa.Column('site_id', sa.Integer(), nullable=True),
+        sa.Column('actor_id', sa.Integer(), nullable=True),
+        sa.Column('from_status', sa.String(length=50), nullable=True),
+        sa.Column('to_status', sa.String(length=50), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_dossier_transition_dossier_id_id', 'dossier_transition',
+                    ['dossier_id', 'id'], unique=False)
+    op.create_index('ix_dossier_transition_site_id_created_at', 'dossier_transition',
+                    ['site_id', 'created_at'], unique=False)
+
+    # Reprise : une entrée par dossier existant, datée de la migration (les
+    # durées du statut actuel sont donc des minorants)
+    op.execute(
+        "INSERT INTO dossier_transition (dossier_id, site_id, actor_id, from_status, to_status, created_at) "
+        "SELECT id, site_id, NULL, NULL, status, CURRENT_TIMESTAMP FROM dossier ORDER BY id"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_dossier_transition_site_id_created_at', table_name='dossier_transition')
+    op.drop_index('ix_dossier_transition_dossier_id_id', table_name='dossier_transition')
+    op.drop_table('dossier_transition')
+    with op.batch_alter_table('dossier', schema=None) as batch_op:
+        batch_op.drop_column('version')
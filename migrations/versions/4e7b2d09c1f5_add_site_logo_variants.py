@@ -0,0 +1,26 @@
+"""add site logo variants
+
+Revision ID: 4e7b2d09c1f5
+Revises: 0d8e4b7a2c65
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7b2d09c1f5'
+down_revision = '0d8e4b7a2c65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('logo_variants', sa.String(length=50), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.drop_column('logo_variants')
@@ -0,0 +1,42 @@
+"""add resumable upload sessions
+
+Revision ID: 5a0c3e8d71b9
+Revises: e19a6f3b8c42
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a0c3e8d71b9'
+down_revision = 'e19a6f3b8c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'upload_session',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('dossier_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=200), nullable=False),
+        sa.Column('mime_type', sa.String(length=100), nullable=True),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('received', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['dossier_id'], ['dossier.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_upload_session_dossier_id', 'upload_session', ['dossier_id'], unique=False)
+    op.create_index('ix_upload_session_updated_at', 'upload_session', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_upload_session_updated_at', table_name='upload_session')
+    op.drop_index('ix_upload_session_dossier_id', table_name='upload_session')
+    op.drop_table('upload_session')
@@ -0,0 +1,50 @@
+"""add message archive
+
+Revision ID: 5c2a9d7e4b18
+Revises: 3b8e1f5c7a29
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2a9d7e4b18'
+down_revision = '3b8e1f5c7a29'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'message_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('sender_id', sa.Integer(), nullable=False),
+        sa.Column('recipient_id', sa.Integer(), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('compressed_body', sa.LargeBinary(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('read_at', sa.DateTime(), nullable=True),
+        sa.Column('conversation_id', sa.Integer(), nullable=True),
+        sa.Column('reply_to_id', sa.Integer(), nullable=True),
+        sa.Column('broadcast_id', sa.Integer(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['sender_id'], ['user.id']),
+        sa.ForeignKeyConstraint(['recipient_id'], ['user.id']),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversation.id']),
+        sa.ForeignKeyConstraint(['broadcast_id'], ['broadcast.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_message_archive_sender_id', 'message_archive', ['sender_id'], unique=False)
+    op.create_index('ix_message_archive_recipient_id_timestamp', 'message_archive',
+                    ['recipient_id', sa.text('timestamp DESC')], unique=False)
+    op.create_index('ix_message_archive_conversation_id_id', 'message_archive',
+                    ['conversation_id', sa.text('id DESC')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_message_archive_conversation_id_id', table_name='message_archive')
+    op.drop_index('ix_message_archive_recipient_id_timestamp', table_name='message_archive')
+    op.drop_index('ix_message_archive_sender_id', table_name='message_archive')
+    op.drop_table('message_archive')
@@ -0,0 +1,110 @@
+"""add message conversations
+
+Revision ID: 6b9d0e4f2a81
+Revises: 1f6a8c3e5b27
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b9d0e4f2a81'
+down_revision = '1f6a8c3e5b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'conversation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('conversation_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('reply_to_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_message_conversation_id', 'conversation', ['conversation_id'], ['id'])
+        batch_op.create_foreign_key('fk_message_reply_to_id', 'message', ['reply_to_id'], ['id'])
+    op.create_index('ix_message_conversation_id_id', 'message',
+                    ['conversation_id', sa.text('id DESC')], unique=False)
+
+    op.create_table(
+        'conversation_member',
+        sa.Column('conversation_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversation.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['last_message_id'], ['message.id']),
+        sa.PrimaryKeyConstraint('conversation_id', 'user_id')
+    )
+    op.create_index('ix_conversation_member_user_id_last_message_at', 'conversation_member',
+                    ['user_id', sa.text('last_message_at DESC'), sa.text('conversation_id DESC')],
+                    unique=False)
+
+    _backfill_conversations()
+
+
+def _backfill_conversations():
+    """Messages existants : une conversation par paire d'utilisateurs"""
+    connection = op.get_bind()
+    message = sa.table(
+        'message', sa.column('id'), sa.column('sender_id'), sa.column('recipient_id'),
+        sa.column('subject'), sa.column('timestamp', sa.DateTime()), sa.column('read_at', sa.DateTime()),
+        sa.column('conversation_id'),
+    )
+    conversation = sa.Table(
+        'conversation', sa.MetaData(),
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('subject', sa.String(length=255)),
+        sa.Column('created_at', sa.DateTime()),
+    )
+    member = sa.table(
+        'conversation_member', sa.column('conversation_id'), sa.column('user_id'),
+        sa.column('last_message_id'), sa.column('last_message_at', sa.DateTime()), sa.column('unread_count'),
+    )
+
+    threads, members = {}, {}
+    rows = connection.execute(
+        sa.select(message).where(message.c.conversation_id.is_(None)).order_by(message.c.id)
+    ).all()
+    for row in rows:
+        pair = tuple(sorted((row.sender_id, row.recipient_id)))
+        if pair not in threads:
+            threads[pair] = connection.execute(
+                conversation.insert().values(subject=row.subject, created_at=row.timestamp)
+            ).inserted_primary_key[0]
+        conversation_id = threads[pair]
+        connection.execute(
+            message.update().where(message.c.id == row.id).values(conversation_id=conversation_id)
+        )
+        for user_id in set(pair):
+            state = members.setdefault((conversation_id, user_id), {'unread_count': 0})
+            state['last_message_id'] = row.id
+            state['last_message_at'] = row.timestamp
+            if user_id == row.recipient_id and row.read_at is None:
+                state['unread_count'] += 1
+
+    if members:
+        connection.execute(member.insert(), [
+            {'conversation_id': conversation_id, 'user_id': user_id, **state}
+            for (conversation_id, user_id), state in members.items()
+        ])
+
+
+def downgrade():
+    op.drop_index('ix_conversation_member_user_id_last_message_at', table_name='conversation_member')
+    op.drop_table('conversation_member')
+    op.drop_index('ix_message_conversation_id_id', table_name='message')
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_message_reply_to_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_message_conversation_id', type_='foreignkey')
+        batch_op.drop_column('reply_to_id')
+        batch_op.drop_column('conversation_id')
+    op.drop_table('conversation')
@@ -0,0 +1,51 @@
+"""add message broadcasts
+
+Revision ID: 7a2c4f8e1d56
+Revises: 2d7e5a1c9f03
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2c4f8e1d56'
+down_revision = '2d7e5a1c9f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'broadcast',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sender_id', sa.Integer(), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('target', sa.String(length=50), nullable=False),
+        sa.Column('recipient_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['sender_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Copies d'une diffusion : corps NULL, lu dans broadcast.body
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('broadcast_id', sa.Integer(), nullable=True))
+        batch_op.alter_column('body', existing_type=sa.Text(), nullable=True)
+        batch_op.create_foreign_key('fk_message_broadcast_id', 'broadcast', ['broadcast_id'], ['id'])
+    op.create_index('ix_message_broadcast_id', 'message', ['broadcast_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_message_broadcast_id', table_name='message')
+    # Corps partagés recopiés avant de rendre la colonne obligatoire
+    op.execute(
+        "UPDATE message SET body = (SELECT body FROM broadcast WHERE broadcast.id = message.broadcast_id) "
+        "WHERE body IS NULL"
+    )
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_message_broadcast_id', type_='foreignkey')
+        batch_op.alter_column('body', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column('broadcast_id')
+    op.drop_table('broadcast')
@@ -0,0 +1,24 @@
+"""drop ix_dossier_site_id (leading column of ix_dossier_site_id_status)
+
+Revision ID: 7c1e5a9d3b42
+Revises: 4d7b1e9a2f60
+Create Date: 2026-10-21 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e5a9d3b42'
+down_revision = '4d7b1e9a2f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index('ix_dossier_site_id', table_name='dossier')
+
+
+def downgrade():
+    op.create_index('ix_dossier_site_id', 'dossier', ['site_id'], unique=False)
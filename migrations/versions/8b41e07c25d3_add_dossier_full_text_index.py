@@ -0,0 +1,26 @@
+"""add dossier full text index
+
+Revision ID: 8b41e07c25d3
+Revises: 3f2a9c1d7b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.search import create_dossier_index, drop_dossier_index
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41e07c25d3'
+down_revision = '3f2a9c1d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_dossier_index(op.get_bind())
+
+
+def downgrade():
+    drop_dossier_index(op.get_bind())
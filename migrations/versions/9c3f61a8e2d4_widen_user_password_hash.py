@@ -0,0 +1,33 @@
+"""widen user password hash
+
+Revision ID: 9c3f61a8e2d4
+Revises: 4e7b2d09c1f5
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3f61a8e2d4'
+down_revision = '4e7b2d09c1f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Un hash scrypt Werkzeug fait déjà 162 caractères
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+                              existing_type=sa.String(length=128),
+                              type_=sa.String(length=255),
+                              existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+                              existing_type=sa.String(length=255),
+                              type_=sa.String(length=128),
+                              existing_nullable=True)
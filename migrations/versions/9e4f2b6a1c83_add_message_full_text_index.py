@@ -0,0 +1,28 @@
+"""add message full text index
+
+Revision ID: 9e4f2b6a1c83
+Revises: 5c2a9d7e4b18
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.search import create_message_index, drop_message_index, rebuild_message_index
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4f2b6a1c83'
+down_revision = '5c2a9d7e4b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if create_message_index(bind):
+        rebuild_message_index(bind)
+
+
+def downgrade():
+    drop_message_index(op.get_bind())
@@ -0,0 +1,53 @@
+"""message ids never reused (sqlite AUTOINCREMENT)
+
+Revision ID: a3d8f6c2e915
+Revises: 7c1e5a9d3b42
+Create Date: 2026-10-22 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d8f6c2e915'
+down_revision = '7c1e5a9d3b42'
+branch_labels = None
+depends_on = None
+
+# Index décroissants : la reconstruction par lot les recréerait sans DESC
+DESC_INDEXES = [
+    ('ix_message_recipient_id_timestamp', ['recipient_id', sa.text('timestamp DESC'), sa.text('id DESC')]),
+    ('ix_message_conversation_id_id', ['conversation_id', sa.text('id DESC')]),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # Reconstruction de la table : AUTOINCREMENT ne s'ajoute pas à une table existante
+    _rebuild_message(sqlite_autoincrement=True)
+
+    # Compteur au-delà des ids déjà archivés : ils ne seront jamais réattribués
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'message'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'message', max("
+        "coalesce((SELECT max(id) FROM message), 0), "
+        "coalesce((SELECT max(id) FROM message_archive), 0))"
+    )
+
+
+def _rebuild_message(**table_kwargs):
+    for name, _ in DESC_INDEXES:
+        op.drop_index(name, table_name='message')
+    with op.batch_alter_table('message', recreate='always', table_kwargs=table_kwargs):
+        pass
+    for name, columns in DESC_INDEXES:
+        op.create_index(name, 'message', columns, unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild_message(sqlite_autoincrement=False)
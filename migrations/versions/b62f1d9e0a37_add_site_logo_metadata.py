@@ -0,0 +1,87 @@
+"""add site logo metadata
+
+Revision ID: b62f1d9e0a37
+Revises: 5a0c3e8d71b9
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+import hashlib
+import os
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+from PIL import Image, UnidentifiedImageError
+
+LOGO_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+
+# revision identifiers, used by Alembic.
+revision = 'b62f1d9e0a37'
+down_revision = '5a0c3e8d71b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('logo_path', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('logo_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('logo_size', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('logo_width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('logo_height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('logo_mime', sa.String(length=50), nullable=True))
+
+    # Reprise des logos existants : l'ancienne page publique affichait le
+    # premier fichier de static/sites/<slug>/, gardé sans variantes mais
+    # renommé avec son hash (URL servie avec un cache immuable)
+    bind = op.get_bind()
+    sites = bind.execute(sa.text("SELECT id, slug FROM site WHERE logo_path IS NULL")).fetchall()
+    for site_id, slug in sites:
+        metadata = _legacy_logo(slug)
+        if metadata:
+            bind.execute(sa.text(
+                "UPDATE site SET logo_path = :logo_path, logo_hash = :logo_hash, logo_size = :logo_size, "
+                "logo_width = :logo_width, logo_height = :logo_height, logo_mime = :logo_mime WHERE id = :id"
+            ), dict(metadata, id=site_id))
+
+
+def _legacy_logo(slug):
+    """
+    Renomme le logo déposé avant cette migration dans static/sites/<slug>/
+    en logo.<hash>.<ext> ; renvoie ses métadonnées, ou None.
+    """
+    folder = os.path.join(current_app.static_folder, 'sites', slug)
+    if not os.path.isdir(folder):
+        return None
+    for filename in sorted(os.listdir(folder)):
+        path = os.path.join(folder, filename)
+        if not os.path.isfile(path) or filename.rsplit('.', 1)[-1].lower() not in LOGO_EXTENSIONS:
+            continue
+        try:
+            with Image.open(path) as image:
+                width, height, mime = image.width, image.height, Image.MIME.get(image.format)
+        except (UnidentifiedImageError, OSError):
+            continue
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        fingerprinted = f"logo.{digest[:16]}.{filename.rsplit('.', 1)[1].lower()}"
+        os.replace(path, os.path.join(folder, fingerprinted))
+        return {
+            'logo_path': f'sites/{slug}/{fingerprinted}',
+            'logo_hash': digest,
+            'logo_size': os.path.getsize(os.path.join(folder, fingerprinted)),
+            'logo_width': width,
+            'logo_height': height,
+            'logo_mime': mime,
+        }
+    return None
+
+
+def downgrade():
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.drop_column('logo_mime')
+        batch_op.drop_column('logo_height')
+        batch_op.drop_column('logo_width')
+        batch_op.drop_column('logo_size')
+        batch_op.drop_column('logo_hash')
+        batch_op.drop_column('logo_path')
@@ -0,0 +1,30 @@
+"""add file path, size and checksum
+
+Revision ID: c7d5e2a94f18
+Revises: 8b41e07c25d3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d5e2a94f18'
+down_revision = '8b41e07c25d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('path', sa.String(length=500), nullable=True))
+        batch_op.add_column(sa.Column('size', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('checksum', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.drop_column('checksum')
+        batch_op.drop_column('size')
+        batch_op.drop_column('path')
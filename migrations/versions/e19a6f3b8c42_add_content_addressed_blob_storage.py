@@ -0,0 +1,38 @@
+"""add content addressed blob storage
+
+Revision ID: e19a6f3b8c42
+Revises: c7d5e2a94f18
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e19a6f3b8c42'
+down_revision = 'c7d5e2a94f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'blob',
+        sa.Column('checksum', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('mime_type', sa.String(length=100), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('checksum')
+    )
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('mime_type', sa.String(length=100), nullable=True))
+        batch_op.create_index('ix_file_checksum', ['checksum'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.drop_index('ix_file_checksum')
+        batch_op.drop_column('mime_type')
+    op.drop_table('blob')
@@ -0,0 +1,75 @@
+import io
+import os
+
+# Base SQLite en mémoire et hachage rapide : lus par config.Config à l'import
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+import pytest
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Dossier, User
+from app.uploads import store_upload
+from werkzeug.datastructures import FileStorage
+
+PASSWORD = 'secret123'
+
+
+@pytest.fixture
+def app(tmp_path):
+    # Pas de contexte applicatif permanent : chaque requête du client de test
+    # a le sien (session et current_user neufs), comme en production
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, UPLOAD_FOLDER=str(tmp_path))
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()  # base en mémoire : libérée avec sa connexion
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """Requêtes SQL exécutées, (requête, paramètres) (liste remise à zéro par le test)"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def make_user(username, role='user', site_id=None):
+    """Crée un utilisateur (dans un contexte applicatif) ; renvoie son email"""
+    user = User(username=username, email=f'{username}@example.org', role=role, site_id=site_id)
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    return user.email
+
+
+def login(client, email):
+    response = client.post('/login', data={'email': email, 'password': PASSWORD})
+    assert response.status_code == 302
+    return response
+
+
+def add_dossier(site_id=None, status='déposé', files=()):
+    """Crée un dossier et ses fichiers `files` ((nom, contenu)) ; renvoie le Dossier commité"""
+    dossier = Dossier(first_name='Jean', last_name='Dupont', email='jean@example.org',
+                      job_type='peinture', status=status, site_id=site_id)
+    db.session.add(dossier)
+    db.session.flush()
+    for filename, content in files:
+        db.session.add(store_upload(FileStorage(io.BytesIO(content), filename=filename), dossier.id))
+    db.session.commit()
+    return dossier
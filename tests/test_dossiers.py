@@ -0,0 +1,75 @@
+from sqlalchemy import update
+from app import db
+from app.dossiers import IN_REVIEW, SUBMITTED, VALIDATED, log_transition
+from app.models import Dossier, DossierTransition, Site
+from app.routes import sub_admin
+from conftest import add_dossier, login, make_user
+
+
+def journal(dossier_id):
+    return [(row.from_status, row.to_status) for row in
+            DossierTransition.query.filter_by(dossier_id=dossier_id).order_by(DossierTransition.id)]
+
+
+def setup_site(client):
+    site = Site(name='Asso', slug='asso')
+    db.session.add(site)
+    db.session.commit()
+    dossier = add_dossier(site.id)
+    login(client, make_user('gestionnaire', 'sub_admin', site_id=site.id))
+    return dossier.id
+
+
+def test_concurrent_status_change_is_a_conflict(app, client, monkeypatch):
+    with app.app_context():
+        dossier_id = setup_site(client)
+
+    def transition_then_concurrent_update(dossier, *args, **kwargs):
+        # Un autre sous-admin modifie le dossier entre la lecture et le commit
+        result = apply_transition(dossier, *args, **kwargs)
+        with db.session.no_autoflush:
+            db.session.execute(update(Dossier).where(Dossier.id == dossier.id)
+                               .values(status=VALIDATED, version=Dossier.version + 1)
+                               .execution_options(synchronize_session=False))
+        return result
+
+    apply_transition = sub_admin.apply_transition
+    monkeypatch.setattr(sub_admin, 'apply_transition', transition_then_concurrent_update)
+    response = client.post(f'/sub_admin/dossier/{dossier_id}/status',
+                           data={'status': IN_REVIEW, 'version': 1}, follow_redirects=True)
+    assert 'modifié entre-temps' in response.get_data(as_text=True)
+    with app.app_context():
+        dossier = db.session.get(Dossier, dossier_id)
+        assert (dossier.status, dossier.version) == (SUBMITTED, 1)  # écriture concurrente annulée avec le rollback
+        assert journal(dossier_id) == [(None, SUBMITTED)]
+
+
+def test_stale_version_from_the_form_is_a_conflict(app, client):
+    with app.app_context():
+        dossier_id = setup_site(client)
+    client.post(f'/sub_admin/dossier/{dossier_id}/status', data={'status': IN_REVIEW, 'version': 1})
+    response = client.post(f'/sub_admin/dossier/{dossier_id}/status',
+                           data={'status': VALIDATED, 'version': 1}, follow_redirects=True)
+    assert 'modifié entre-temps' in response.get_data(as_text=True)
+    with app.app_context():
+        assert db.session.get(Dossier, dossier_id).status == IN_REVIEW
+        assert journal(dossier_id) == [(None, SUBMITTED), (SUBMITTED, IN_REVIEW)]
+
+
+def test_transitions_are_written_once_per_commit(app):
+    with app.app_context():
+        dossier = add_dossier()
+        assert journal(dossier.id) == [(None, SUBMITTED)]
+
+        # SAVEPOINT relâché : rien n'est écrit avant le commit de la transaction
+        with db.session.begin_nested():
+            log_transition(db.session, dossier.id, None, None, SUBMITTED, IN_REVIEW)
+        assert journal(dossier.id) == [(None, SUBMITTED)]
+        db.session.commit()
+        db.session.commit()
+        assert journal(dossier.id) == [(None, SUBMITTED), (SUBMITTED, IN_REVIEW)]
+
+        log_transition(db.session, dossier.id, None, None, IN_REVIEW, VALIDATED)
+        db.session.rollback()
+        db.session.commit()
+        assert journal(dossier.id) == [(None, SUBMITTED), (SUBMITTED, IN_REVIEW)]
@@ -0,0 +1,61 @@
+import re
+import pytest
+from app import db
+from app.models import Dossier, Site
+from conftest import login, make_user
+
+
+@pytest.fixture
+def applicant(app, client):
+    """Utilisateur connecté, CSRF activé ; renvoie (site_id, jeton du formulaire de dépôt)"""
+    with app.app_context():
+        site = Site(name='Site', slug='site')
+        db.session.add(site)
+        db.session.commit()
+        site_id = site.id
+        email = make_user('jean', site_id=site_id)
+    login(client, email)
+    app.config['WTF_CSRF_ENABLED'] = True
+    page = client.get('/dossier/submit').get_data(as_text=True)
+    token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1)
+    return site_id, token
+
+
+def draft_data(site_id, **extra):
+    return {'first_name': 'Jean', 'last_name': 'Dupont', 'email': 'jean@example.org',
+            'job_type': 'peinture', 'site': site_id, **extra}
+
+
+def test_draft_creation_requires_csrf_token(app, client, applicant):
+    site_id, token = applicant
+    assert client.post('/dossier/draft', data=draft_data(site_id)).status_code == 400
+
+    response = client.post('/dossier/draft', data=draft_data(site_id, csrf_token=token))
+    assert response.status_code == 201
+
+
+def test_draft_submission_requires_csrf_header(app, client, applicant):
+    site_id, token = applicant
+    dossier_id = client.post('/dossier/draft', data=draft_data(site_id, csrf_token=token)).json['dossier_id']
+
+    assert client.post(f'/dossier/{dossier_id}/submit').status_code == 400
+    response = client.post(f'/dossier/{dossier_id}/submit', headers={'X-CSRFToken': token})
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.get(Dossier, dossier_id).status == 'déposé'
+
+
+def test_sub_admin_cannot_submit_or_delete_drafts(app, client, applicant):
+    site_id, token = applicant
+    dossier_id = client.post('/dossier/draft', data=draft_data(site_id, csrf_token=token)).json['dossier_id']
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        email = make_user('gestionnaire', 'sub_admin', site_id=site_id)
+    client.get('/logout')
+    login(client, email)
+
+    assert client.post(f'/sub_admin/dossier/{dossier_id}/status',
+                       data={'status': 'déposé'}).status_code == 404
+    assert client.post(f'/sub_admin/dossier/{dossier_id}/delete').status_code == 404
+    with app.app_context():
+        assert db.session.get(Dossier, dossier_id).status == 'brouillon'
@@ -0,0 +1,24 @@
+import io
+import zipfile
+from app import db
+from app.models import Site
+from conftest import add_dossier, login, make_user
+
+
+def test_site_export_streams_every_dossier_with_names_unique_per_folder(app, client):
+    with app.app_context():
+        site = Site(name='Asso', slug='asso')
+        db.session.add(site)
+        db.session.commit()
+        first = add_dossier(site.id, files=[('cv.pdf', b'un'), ('cv.pdf', b'deux')])
+        second = add_dossier(site.id, files=[('cv.pdf', b'trois')])
+        add_dossier(site.id, status='brouillon', files=[('cv.pdf', b'brouillon')])
+        folders = [f'{dossier.id}_Dupont_Jean' for dossier in (first, second)]
+        email = make_user('gestionnaire', 'sub_admin', site_id=site.id)
+    login(client, email)
+
+    response = client.get('/sub_admin/export.zip')
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.namelist() == [f'{folders[0]}/cv.pdf', f'{folders[0]}/cv_1.pdf', f'{folders[1]}/cv.pdf']
+        assert archive.read(f'{folders[1]}/cv.pdf') == b'trois'
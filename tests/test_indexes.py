@@ -0,0 +1,63 @@
+from app import db
+from app.models import Dossier, Site
+from conftest import PASSWORD, login, make_user
+
+
+def query_plan(app, queries, *markers):
+    """EXPLAIN QUERY PLAN de la première requête exécutée qui contient tous les `markers`"""
+    statement, parameters = next(
+        (statement, parameters) for statement, parameters in queries
+        if all(marker in statement for marker in markers)
+    )
+    with app.app_context():
+        rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [row[3] for row in rows]
+
+
+def setup_site(app):
+    with app.app_context():
+        site = Site(name='Site', slug='site')
+        db.session.add(site)
+        db.session.commit()
+        db.session.add_all([
+            Dossier(first_name='Jean', last_name='Dupont', email='jean@example.org', site_id=site.id)
+            for _ in range(3)
+        ])
+        db.session.commit()
+        return site.id
+
+
+def test_site_login_searches_user_by_email(app, client, queries):
+    site_id = setup_site(app)
+    with app.app_context():
+        email = make_user('jean', site_id=site_id)
+    queries.clear()
+    assert client.post('/site/login', data={'email': email, 'password': PASSWORD}).status_code == 302
+
+    plan = query_plan(app, queries, 'FROM user', 'user.site_id = ?')
+    assert plan[0].startswith('SEARCH user USING INDEX')
+    assert '(email=?' in plan[0]
+
+
+def test_sub_admin_dashboard_uses_site_status_index(app, client, queries):
+    site_id = setup_site(app)
+    with app.app_context():
+        email = make_user('sub', 'sub_admin', site_id=site_id)
+    login(client, email)
+    queries.clear()
+    assert client.get('/sub_admin/').status_code == 200
+
+    plan = query_plan(app, queries, 'FROM dossier', 'dossier.site_id = ?')
+    assert plan[0] == 'SEARCH dossier USING INDEX ix_dossier_site_id_status (site_id=?)'
+
+
+def test_inbox_uses_member_index(app, client, queries):
+    with app.app_context():
+        email = make_user('jean')
+    login(client, email)
+    queries.clear()
+    assert client.get('/messaging/').status_code == 200
+
+    plan = query_plan(app, queries, 'FROM conversation_member')
+    assert plan[0].startswith('SEARCH conversation_member USING INDEX '
+                              'ix_conversation_member_user_id_last_message_at (user_id=?')
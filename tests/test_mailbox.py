@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+from app import db
+from app.mailbox import archive_messages, deliver_message, find_message, remove_message
+from app.models import ArchivedMessage, Message, User
+from conftest import make_user
+
+
+def send(sender_id, recipient_id, subject, timestamp=None, read=False):
+    message = Message(sender_id=sender_id, recipient_id=recipient_id, subject=subject, body=subject,
+                      timestamp=timestamp, read_at=timestamp if read else None)
+    deliver_message(message)
+    db.session.commit()
+    return message.id
+
+
+def test_message_ids_are_not_reused_after_archiving(app):
+    old = datetime.utcnow() - timedelta(days=400)
+    with app.app_context():
+        make_user('alice')
+        make_user('bob')
+        alice, bob = (User.query.filter_by(username=name).one().id for name in ('alice', 'bob'))
+        archived = [send(alice, bob, f'ancien {i}', old, read=True) for i in range(2)]
+        newest = send(alice, bob, 'récent')
+
+        assert archive_messages({'user': 1}) == 2
+        db.session.commit()
+        remove_message(db.session.get(Message, newest))
+        db.session.commit()
+
+        # Le plus grand id n'est plus en table : il ne doit pas être réattribué
+        new_id = send(alice, bob, 'nouveau')
+        assert new_id not in archived + [newest]
+        assert find_message(new_id).subject == 'nouveau'
+        assert {m.id for m in ArchivedMessage.query} == set(archived)
@@ -0,0 +1,45 @@
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from app import db
+from app.mailbox import archive_messages, broadcast_message, deliver_message
+from app.models import Message, User
+from conftest import login, make_user
+
+RECIPIENTS = ('bob', 'carol', 'dave', 'erin')
+
+
+def thread(client, email, conversation_id):
+    client.get('/logout')
+    login(client, email)
+    page = client.get(f'/messaging/conversation/{conversation_id}').get_data(as_text=True)
+    archived = page.split('Messages archivés')[1] if 'Messages archivés' in page else ''
+    return len(re.findall(r'class="thread-message"', page)), archived.count('<li>')
+
+
+def test_broadcast_sender_sees_one_copy_in_the_thread(app, client):
+    with app.app_context():
+        emails = {name: make_user(name) for name in ('alice',) + RECIPIENTS}
+        ids = {name: User.query.filter_by(username=name).one().id for name in emails}
+        broadcast = broadcast_message(ids['alice'], 'Assemblée', 'Rendez-vous lundi',
+                                      select(User.id).where(User.username.in_(RECIPIENTS)), 'user')
+        broadcast_id = broadcast.id
+        copy = Message.query.filter_by(broadcast_id=broadcast_id, recipient_id=ids['bob']).one()
+        conversation_id = copy.conversation_id
+        deliver_message(Message(sender_id=ids['bob'], recipient_id=ids['alice'], subject='Assemblée',
+                                body='Présent'), reply_to=copy)
+        db.session.commit()
+
+    assert thread(client, emails['alice'], conversation_id) == (2, 0)  # une copie + la réponse
+    assert thread(client, emails['bob'], conversation_id) == (2, 0)
+    assert thread(client, emails['carol'], conversation_id) == (1, 0)
+
+    # Copies lues et expirées : archivées, toujours une seule pour l'expéditeur
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(days=400)
+        db.session.execute(update(Message).where(Message.broadcast_id == broadcast_id)
+                           .values(read_at=old, timestamp=old))
+        assert archive_messages({'user': 1}) == len(RECIPIENTS)
+        db.session.commit()
+    assert thread(client, emails['alice'], conversation_id) == (1, 1)
+    assert thread(client, emails['carol'], conversation_id) == (0, 1)
@@ -0,0 +1,37 @@
+from flask import request
+from app import create_app
+from app.ratelimit import MemoryWindowStore
+
+
+def test_rejected_attempts_are_not_recorded(monkeypatch):
+    store = MemoryWindowStore()
+    clock = [1000.0]
+    monkeypatch.setattr('app.ratelimit.time.time', lambda: clock[0])
+
+    for _ in range(3):
+        store.hit('k', 3, 60)
+        clock[0] += 1
+    # Rafale rejetée : ni enregistrée, ni prolongeant le blocage
+    for _ in range(100):
+        count, oldest = store.hit('k', 3, 60)
+        assert count == 4 and oldest == 1000.0
+    assert len(store._hits['k']) == 3
+
+    clock[0] = 1060.5  # la plus ancienne tentative sort de la fenêtre
+    count, _ = store.hit('k', 3, 60)
+    assert count == 3
+
+
+def test_client_ip_from_trusted_proxy(monkeypatch):
+    monkeypatch.setattr('config.Config.PROXY_FIX_X_FOR', 1)
+    app = create_app()
+    seen = []
+
+    @app.route('/_ip')
+    def client_ip():
+        seen.append(request.remote_addr)
+        return ''
+
+    app.test_client().get('/_ip', headers={'X-Forwarded-For': '203.0.113.7'},
+                          environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    assert seen == ['203.0.113.7']
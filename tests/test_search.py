@@ -0,0 +1,34 @@
+from sqlalchemy import select
+from app import db
+from app.mailbox import broadcast_message
+from app.models import User
+from app.search import search_messages
+from conftest import make_user
+from test_mailbox import send
+
+
+def test_search_messages_covers_received_broadcasts_with_a_fixed_query(app, queries):
+    with app.test_request_context():  # keyset_paginate lit la requête
+        for name in ('alice', 'bob', 'carol'):
+            make_user(name)
+        alice, bob, carol = (User.query.filter_by(username=name).one().id for name in ('alice', 'bob', 'carol'))
+        send(alice, bob, 'peinture salon')
+        send(carol, alice, 'peinture cuisine')
+        for i in range(5):
+            broadcast_message(alice, f'peinture annonce {i}', 'bonjour', select(User.id).where(User.id == bob), 'user')
+        broadcast_message(carol, 'peinture réservée', 'bonjour', select(User.id).where(User.id == alice), 'user')
+        db.session.commit()
+
+        queries.clear()
+        subjects = sorted(m.subject for m in search_messages(bob, 'peinture').items)
+        assert subjects == ['peinture annonce 0', 'peinture annonce 1', 'peinture annonce 2',
+                            'peinture annonce 3', 'peinture annonce 4', 'peinture salon']
+        # Une seule requête MATCH, sans un terme par diffusion reçue
+        match = [parameters for statement, parameters in queries if 'MATCH' in statement]
+        assert len(match) == 1 and not any('"b' in str(p) for p in match[0])
+
+        subjects = sorted(m.subject for m in search_messages(alice, 'peinture').items)
+        assert subjects == ['peinture annonce 0', 'peinture annonce 1', 'peinture annonce 2',
+                            'peinture annonce 3', 'peinture annonce 4', 'peinture cuisine',
+                            'peinture réservée', 'peinture salon']
+        assert [m.subject for m in search_messages(carol, 'annonce').items] == []
@@ -0,0 +1,29 @@
+import io
+from PIL import Image
+from app import db
+from app.models import Site
+from app.site_assets import logo_asset_paths, save_site_logo
+from conftest import login, make_user
+from werkzeug.datastructures import FileStorage
+
+
+def test_delete_site_removes_logo_files(app, client, tmp_path):
+    app.static_folder = str(tmp_path / 'static')
+    png = io.BytesIO()
+    Image.new('RGB', (300, 120), 'red').save(png, 'PNG')
+    with app.app_context():
+        email = make_user('admin', 'super_admin')
+        site = Site(name='Asso', slug='asso')
+        png.seek(0)
+        assert save_site_logo(site, FileStorage(png, filename='logo.png'))
+        db.session.add(site)
+        db.session.commit()
+        site_id = site.id
+        paths = logo_asset_paths(site)
+    folder = tmp_path / 'static' / 'sites' / 'asso'
+    assert paths and all((tmp_path / 'static' / path).is_file() for path in paths)
+
+    login(client, email)
+    response = client.post(f'/super_admin/site/{site_id}/delete')
+    assert response.status_code == 302
+    assert not folder.exists()
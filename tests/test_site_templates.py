@@ -0,0 +1,43 @@
+import pytest
+from jinja2.exceptions import SecurityError
+from app import db
+from app.models import Site
+from conftest import login, make_user
+
+PAYLOAD = '{{ "".__class__.__mro__[1].__subclasses__()|length }}'
+
+
+@pytest.fixture
+def site_id(app, client):
+    with app.app_context():
+        site = Site(name='Asso', slug='asso')
+        db.session.add(site)
+        db.session.commit()
+        email = make_user('admin', 'super_admin')
+        site_id = site.id
+    login(client, email)
+    return site_id
+
+
+def edit(client, site_id, template):
+    return client.post(f'/super_admin/site/{site_id}/edit', data={
+        'name': 'Asso', 'slug': 'asso', 'sub_admin_id': 0, 'register_template': template,
+    })
+
+
+def test_default_register_template_renders_in_sandbox(client, site_id):
+    response = client.get('/asso/register')
+    assert response.status_code == 200
+    assert 'name="username"' in response.get_data(as_text=True)
+
+
+def test_site_template_cannot_reach_python_internals(client, site_id):
+    assert edit(client, site_id, f'<p>{PAYLOAD}</p>').status_code == 302
+    with pytest.raises(SecurityError):
+        client.get('/asso/register')
+
+
+def test_site_template_syntax_is_checked_on_save(client, site_id):
+    response = edit(client, site_id, '{% if %}')
+    assert response.status_code == 200
+    assert 'Formulaire invalide' in response.get_data(as_text=True)
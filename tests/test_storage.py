@@ -0,0 +1,70 @@
+import os
+from app import db
+from app.models import Blob
+from app.storage import blob_fullpath
+from conftest import add_dossier
+
+CONTENT = b'%PDF-1.4 attestation'
+
+
+def blob(checksum):
+    """(ref_count ou None si la ligne n'existe plus, fichier présent sur disque)"""
+    db.session.expire_all()
+    row = db.session.get(Blob, checksum)
+    return (row.ref_count if row else None), os.path.exists(blob_fullpath(checksum))
+
+
+def test_shared_blob_is_reclaimed_with_its_last_file(app):
+    with app.app_context():
+        first = add_dossier(files=[('a.pdf', CONTENT)])
+        second = add_dossier(files=[('b.pdf', CONTENT)])
+        checksum = first.files[0].checksum
+        assert second.files[0].checksum == checksum
+        assert blob(checksum) == (2, True)
+
+        db.session.delete(first)
+        db.session.commit()
+        assert blob(checksum) == (1, True)
+
+        db.session.delete(second)
+        db.session.commit()
+        assert blob(checksum) == (None, False)
+
+
+def test_rollback_keeps_the_blob(app):
+    with app.app_context():
+        dossier = add_dossier(files=[('a.pdf', CONTENT)])
+        checksum = dossier.files[0].checksum
+
+        db.session.delete(dossier)
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()  # transaction suivante : rien à récupérer
+        assert blob(checksum) == (1, True)
+
+
+def test_savepoint_release_does_not_reclaim_before_commit(app):
+    with app.app_context():
+        dossier = add_dossier(files=[('a.pdf', CONTENT)])
+        checksum = dossier.files[0].checksum
+
+        db.session.delete(dossier)
+        db.session.flush()
+        with db.session.begin_nested():
+            pass  # SAVEPOINT relâché : la transaction englobante reste ouverte
+        assert os.path.exists(blob_fullpath(checksum))
+        db.session.rollback()
+        assert blob(checksum) == (1, True)
+
+
+def test_savepoint_rollback_keeps_earlier_releases(app):
+    with app.app_context():
+        dossier = add_dossier(files=[('a.pdf', CONTENT)])
+        checksum = dossier.files[0].checksum
+
+        db.session.delete(dossier)
+        db.session.flush()
+        savepoint = db.session.begin_nested()
+        savepoint.rollback()
+        db.session.commit()
+        assert blob(checksum) == (None, False)
@@ -0,0 +1,93 @@
+import os
+from app import db
+from app.models import Blob, Dossier, File, Site
+from app.storage import blob_fullpath
+from conftest import add_dossier, login, make_user
+
+CONTENT = b'%PDF-1.4 commun'
+
+
+def make_sites():
+    """Deux sites ; renvoie (id du site géré, id de l'autre site)"""
+    sites = [Site(name='Asso', slug='asso'), Site(name='Autre', slug='autre')]
+    db.session.add_all(sites)
+    db.session.commit()
+    return sites[0].id, sites[1].id
+
+
+def bulk(client, **payload):
+    response = client.post('/sub_admin/dossiers/bulk', json=payload)
+    assert response.status_code == 200
+    return {int(i): result for i, result in response.get_json()['results'].items()}
+
+
+def test_bulk_status_reports_a_result_per_id(app, client):
+    with app.app_context():
+        site_id, other_id = make_sites()
+        submitted = add_dossier(site_id).id
+        in_review = add_dossier(site_id, status='en cours de décision').id
+        validated = add_dossier(site_id, status='validé').id
+        closed = add_dossier(site_id, status='validé').id
+        stale = add_dossier(site_id).id
+        foreign = add_dossier(other_id).id
+        draft = add_dossier(site_id, status='brouillon').id
+        login(client, make_user('gestionnaire', 'sub_admin', site_id=site_id))
+
+    results = bulk(client, action='status', status='en cours de décision',
+                   ids=[submitted, in_review, validated, stale, foreign, draft, 9999],
+                   versions={str(stale): 0})
+    assert results == {
+        submitted: 'updated', in_review: 'unchanged', validated: 'updated', stale: 'conflict',
+        foreign: 'not_found', draft: 'not_found', 9999: 'not_found',
+    }
+    results = bulk(client, action='status', status='déposé', ids=[closed, submitted])
+    assert results == {closed: 'invalid_transition', submitted: 'updated'}
+
+    with app.app_context():
+        statuses = dict(db.session.query(Dossier.id, Dossier.status))
+        assert statuses[stale] == statuses[foreign] == 'déposé'
+        assert statuses[draft] == 'brouillon'
+
+
+def test_bulk_delete_releases_blobs_and_skips_other_sites(app, client):
+    with app.app_context():
+        site_id, other_id = make_sites()
+        first = add_dossier(site_id, files=[('a.pdf', CONTENT), ('b.pdf', b'propre')]).id
+        second = add_dossier(site_id, files=[('c.pdf', CONTENT)]).id
+        foreign = add_dossier(other_id, files=[('d.pdf', b'ailleurs')]).id
+        draft = add_dossier(site_id, status='brouillon').id
+        checksums = dict(db.session.query(File.filename, File.checksum))
+        login(client, make_user('gestionnaire', 'sub_admin', site_id=site_id))
+
+    assert bulk(client, action='delete', ids=[first, foreign, draft]) == {
+        first: 'deleted', foreign: 'not_found', draft: 'not_found'}
+    with app.app_context():
+        assert db.session.get(Blob, checksums['a.pdf']).ref_count == 1  # encore utilisé par c.pdf
+        assert db.session.get(Blob, checksums['b.pdf']) is None
+        assert not os.path.exists(blob_fullpath(checksums['b.pdf']))
+        assert os.path.exists(blob_fullpath(checksums['a.pdf']))
+
+    assert bulk(client, action='delete', ids=[second]) == {second: 'deleted'}
+    with app.app_context():
+        assert db.session.get(Blob, checksums['a.pdf']) is None
+        assert not os.path.exists(blob_fullpath(checksums['a.pdf']))
+        assert db.session.get(Blob, checksums['d.pdf']).ref_count == 1
+        assert {d.id for d in Dossier.query} == {foreign, draft}
+
+
+def test_bulk_form_requires_a_csrf_token(app, client):
+    with app.app_context():
+        site_id, _ = make_sites()
+        dossier_id = add_dossier(site_id).id
+        login(client, make_user('gestionnaire', 'sub_admin', site_id=site_id))
+    app.config['WTF_CSRF_ENABLED'] = True
+
+    client.post('/sub_admin/dossiers/bulk', data={'ids': [dossier_id], 'action': 'delete'})
+    with app.app_context():
+        assert db.session.get(Dossier, dossier_id) is not None
+
+    page = client.get('/sub_admin/').get_data(as_text=True)
+    token = page.split('name="csrf_token" value="')[1].split('"')[0]
+    client.post('/sub_admin/dossiers/bulk', data={'ids': [dossier_id], 'action': 'delete', 'csrf_token': token})
+    with app.app_context():
+        assert db.session.get(Dossier, dossier_id) is None
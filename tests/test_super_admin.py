@@ -0,0 +1,46 @@
+from app import db
+from app.models import Site, User
+from conftest import login, make_user
+
+
+def add_sites(count, start):
+    """
+    `count` sites avec un utilisateur et un sous-admin chacun. Les
+    utilisateurs suivent l'ordre inverse des sites et les sous-admins sont
+    créés en dernier : une page de sites et une page d'utilisateurs ne
+    référencent pas les mêmes lignes.
+    """
+    sites = [Site(name=f'Site {i}', slug=f'site-{i}') for i in range(start, start + count)]
+    db.session.add_all(sites)
+    db.session.flush()
+    for site in reversed(sites):
+        db.session.add(User(username=f'user-{site.slug}', email=f'user-{site.slug}@example.org', site_id=site.id))
+    db.session.flush()
+    for site in reversed(sites):
+        site.sub_admin = User(username=f'sub-{site.slug}', email=f'sub-{site.slug}@example.org',
+                              role='sub_admin', site_id=site.id)
+    db.session.commit()
+
+
+def test_dashboard_query_count_does_not_grow_with_rows(app, client, queries):
+    # Pages courtes : les relations affichées ne sont pas déjà chargées par l'autre liste
+    app.config['PAGINATION_PER_PAGE'] = 10
+    with app.app_context():
+        email = make_user('admin', 'super_admin')
+    login(client, email)
+    client.get('/super_admin/')  # identité mise en cache par le user_loader
+
+    def render():
+        queries.clear()
+        response = client.get('/super_admin/')
+        assert response.status_code == 200
+        return len(queries)
+
+    with app.app_context():
+        add_sites(2, start=0)
+    small = render()
+    with app.app_context():
+        add_sites(20, start=2)
+    large = render()
+
+    assert large == small